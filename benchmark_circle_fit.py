@@ -0,0 +1,63 @@
+import timeit
+
+import numpy as np
+
+from src.CircleContest import circle_fit
+from src.CircleFit import geometric_circle_fit, geometric_circle_fit_batch, robust_circle_fit
+
+
+def arc(n: int, arc_length: float, sigma: float, seed: int = 1):
+    # noisy points on an arc of a 2 m circle, centred 20 m from the instrument
+    rng = np.random.default_rng(seed)
+    phi = np.linspace(0, arc_length, n)
+    x = 15 + 2 * np.cos(phi) + rng.normal(0, sigma, n)
+    y = 12 + 2 * np.sin(phi) + rng.normal(0, sigma, n)
+    return x, y
+
+
+def iterations(x: np.ndarray, y: np.ndarray, tol: float = 1e-10) -> int:
+    # smallest iteration budget that already gives the converged radius
+    r = geometric_circle_fit(x, y, max_iter=100, tol=tol)[2]
+    for max_iter in range(1, 101):
+        if abs(geometric_circle_fit(x, y, max_iter=max_iter, tol=tol)[2] - r) <= tol * r:
+            return max_iter
+    return 100
+
+
+def main():
+    print("radius error [mm] of 100 runs (true radius 2 m, noise 2 cm), mean / std")
+    for arc_length in (np.pi / 3, np.pi, 2 * np.pi):
+        errors = {"algebraic": [], "geometric": []}
+        for seed in range(100):
+            x, y = arc(500, arc_length, 0.02, seed)
+            errors["algebraic"].append(circle_fit(x, y)[2] - 2)
+            errors["geometric"].append(geometric_circle_fit(x, y)[2] - 2)
+        print(
+            f"  arc {np.degrees(arc_length):>3.0f} deg: "
+            + ", ".join(f"{k} {1e3 * np.mean(e):+7.2f} / {1e3 * np.std(e):6.2f}" for k, e in errors.items())
+        )
+
+    print("time per run")
+    for n in (1_000, 10_000):
+        x, y = arc(n, 2 * np.pi, 0.02)
+        for name, fit in (("algebraic", circle_fit), ("geometric", geometric_circle_fit)):
+            elapsed = min(timeit.repeat(lambda: fit(x, y), number=20, repeat=5)) / 20
+            print(f"  {n:>6} points {name:<10} {elapsed * 1e3:7.2f} ms")
+        print(f"  {n:>6} points geometric converged after {iterations(x, y)} iterations")
+        # every 100th point shifted by half a metre, points shifted along the circle stay inliers
+        x[::100] += 0.5
+        elapsed = min(timeit.repeat(lambda: robust_circle_fit(x, y), number=20, repeat=5)) / 20
+        outliers = len(x) - np.count_nonzero(robust_circle_fit(x, y)[3])
+        print(f"  {n:>6} points robust     {elapsed * 1e3:7.2f} ms, {outliers} of {n // 100} shifted points excluded")
+
+    runs = [arc(1_000, 2 * np.pi, 0.02, seed) for seed in range(1_000)]
+    x = np.concatenate([r[0] for r in runs])
+    y = np.concatenate([r[1] for r in runs])
+    offsets = np.r_[0, np.cumsum([len(r[0]) for r in runs])]
+    elapsed = min(timeit.repeat(lambda: geometric_circle_fit_batch(x, y, offsets), number=1, repeat=3))
+    loop = min(timeit.repeat(lambda: [geometric_circle_fit(*r) for r in runs], number=1, repeat=3))
+    print(f"1000 runs of 1000 points: batched {elapsed:.2f} s, loop {loop:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
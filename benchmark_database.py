@@ -0,0 +1,73 @@
+import logging
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.Database import Database
+from src.Run import Run
+
+logging.basicConfig(level=logging.WARNING)
+
+
+def write_db(filename: Path, n: int) -> None:
+    rng = np.random.default_rng(1)
+    radii = rng.uniform(0.5, 3.0, n)
+    stds = rng.uniform(0.01, 0.3, n)
+    with open(filename, "w") as f:
+        for i in range(n):
+            f.write(f"Session {i % 50},{i:08d}-0000-4000-8000-000000000000,2025-06-01 12:00,Name {i},{radii[i]},{stds[i]},\n")
+
+
+def load_legacy(filename: Path) -> list:
+    # Database.from_file before the columnar loader: one Run per line
+    runs = []
+    with open(filename) as f:
+        in_file = f.readlines()
+    for l in in_file:
+        line_split = l.split(",")
+        runs.append(
+            Run(
+                session=line_split[0],
+                id=line_split[1],
+                time=line_split[2],
+                name=line_split[3],
+                circ_radius=float(line_split[4]),
+                circ_std=float(line_split[5]),
+            )
+        )
+    return runs
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        for n in (100_000, 1_000_000):
+            filename = Path(directory) / f"db-{n}.csv"
+            write_db(filename, n)
+
+            t0 = time.perf_counter()
+            runs = load_legacy(filename)
+            legacy = time.perf_counter() - t0
+
+            # first start, writes the snapshot
+            t0 = time.perf_counter()
+            db = Database.from_file(filename=str(filename))
+            columnar = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            db = Database.from_file(filename=str(filename))
+            snapshot = time.perf_counter() - t0
+
+            # the C float parser may differ from float() in the last digits
+            assert len(db) == len(runs) and np.isclose(db.get_run(runs[-1].id).circ_std, runs[-1].circ_std, rtol=1e-12)
+            for name, elapsed in (
+                ("legacy readlines + Run", legacy),
+                ("columnar read_csv", columnar),
+                ("columnar from snapshot", snapshot),
+            ):
+                print(f"{n:>9,} rows  {name:<24} {elapsed:>7.3f} s  ({n / elapsed:>12,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
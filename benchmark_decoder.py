@@ -0,0 +1,73 @@
+import timeit
+
+from src.pygeocom import (
+    REPLY_DECODERS,
+    ReturnCode,
+    decode_parameters,
+    noop_return_code_handler,
+    parse_reply_header,
+)
+
+# TMC_GetFullMeas reply as sent by the instrument
+REPLY = b"%R1P,0,3:0,1.57079632679489,1.60079632679489,0.00001,0.00012,-0.00007,0.00001,8.12345678,123456\r\n"
+
+
+def decode_legacy(d: bytes):
+    # reply parsing of PyGeoCom._request and get_full_measurement before the decoder table
+    header, parameters = d.split(b":", 1)
+
+    reply_type, geocom_return_code, transaction_id = header.split(b",")
+    assert reply_type == b"%R1P"
+    geocom_return_code = int(geocom_return_code)
+    transaction_id = int(transaction_id)
+
+    parameters = parameters.rstrip()
+    rpc_return_code, *p = parameters.split(b",")
+    rpc_return_code = ReturnCode(int(rpc_return_code))
+
+    noop_return_code_handler(rpc_return_code)
+
+    (
+        _,
+        _,
+        horizontal,
+        vertical,
+        accIncl,
+        crossIncl,
+        lenIncl,
+        accIncl,
+        slope_distance,
+        measure_time,
+    ) = (
+        geocom_return_code,
+        rpc_return_code,
+    ) + tuple(p)
+    slope_distance = float(slope_distance)
+    measure_time = int(measure_time)
+    return (
+        measure_time,
+        float(horizontal),
+        float(vertical),
+        slope_distance,
+        float(accIncl),
+        float(crossIncl),
+        float(lenIncl),
+    )
+
+
+def decode_table(d: bytes):
+    geocom_return_code, _, parameters = parse_reply_header(d)
+    return decode_parameters(geocom_return_code, parameters, noop_return_code_handler, REPLY_DECODERS[2167])
+
+
+def main():
+    n = 200_000
+    assert decode_legacy(REPLY) == decode_table(REPLY)
+
+    for name, decode in (("legacy _request path", decode_legacy), ("decoder table", decode_table)):
+        elapsed = min(timeit.repeat(lambda: decode(REPLY), number=n, repeat=5))
+        print(f"{name:<22} {n / elapsed:>12,.0f} replies/s  ({elapsed / n * 1e6:.2f} us/reply)")
+
+
+if __name__ == "__main__":
+    main()
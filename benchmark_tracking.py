@@ -0,0 +1,54 @@
+import logging
+from time import perf_counter, sleep
+
+from src.GeoComSimulator import SimulatedInstrument, SimulatorConfig, SimulatorStream
+from src.TotalStation import Connection, TotalStation
+
+# logging configuration
+logging.basicConfig(
+    format="%(levelname)-8s %(asctime)s.%(msecs)03d - %(message)s",
+    level=logging.INFO,
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+
+
+def main():
+    # simulated link settings
+    config = SimulatorConfig(latency=0.02, baud=115200, dropout_rate=0.0, zero_distance_rate=0.02, edm_rate=20, seed=1)
+    max_in_flight = 2
+    n_samples = 200
+    acquisition_time = 5.0
+
+    stream = SimulatorStream(SimulatedInstrument(config), timeout=1.0)
+    Tachy = TotalStation(
+        Connection(com="simulator", baud=config.baud, tout=1, max_in_flight=max_in_flight), stream=stream
+    )
+    if not Tachy.start_tracking():
+        logging.error("Failed to start tracking!")
+        return
+
+    t0 = perf_counter()
+    for _ in range(n_samples):
+        Tachy.add_point()
+    elapsed = perf_counter() - t0
+    print(
+        f"add_point: {n_samples} requests in {elapsed:.2f} s: {n_samples / elapsed:.1f} Hz, "
+        f"{len(Tachy.x_vals)} points accepted"
+    )
+
+    # background acquisition with max_in_flight requests on the link
+    Tachy.clear_points()
+    samples = Tachy.start_acquisition()
+    sleep(acquisition_time)
+    Tachy.stop_acquisition()
+    n = Tachy.collect_points(samples)
+    print(
+        f"acquisition: {samples.cursor} samples in {acquisition_time:.1f} s: "
+        f"{samples.cursor / acquisition_time:.1f} Hz, {n} points accepted"
+    )
+    Tachy.stop_tracking()
+    Tachy.geo.statistics.log_summary()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,9 @@
 from src.CircleContest import CircleContest
-from src.Database import EvaluationMetric
+from src.Database import Database, EvaluationMetric
+from src.SqliteDatabase import SqliteDatabase
 from src.TotalStation import TotalStation, Connection
 import logging
+import time
 
 # logging configuration
 logging.basicConfig(
@@ -24,7 +26,10 @@ def main():
     Session
     """
     session = "GAF 8b"
-    circ_con = CircleContest(ts=Tachy, ev_metric=EvaluationMetric.RATIO)
+    # True to share a SQLite database with other contest PCs (see README)
+    use_sqlite = False
+    db = SqliteDatabase.from_file() if use_sqlite else Database.from_file()
+    circ_con = CircleContest(ts=Tachy, ev_metric=EvaluationMetric.RATIO, database=db)
 
     # new run
     circ_con.new_run(session=session, manual=manual)
@@ -32,6 +37,10 @@ def main():
     # leaderboard
     circ_con.print_leaderboard(ev_metric=EvaluationMetric.RATIO)
 
+    # link statistics of this session
+    Tachy.geo.statistics.log_summary()
+    Tachy.geo.statistics.dump_json(f"./db/geocom-{time.strftime('%Y-%m-%d_%H-%M-%S')}.json")
+
 
 if __name__ == "__main__":
     main()
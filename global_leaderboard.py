@@ -1,6 +1,7 @@
 import logging
 from src.CircleContest import EvaluationMetric
 from src.Database import Database
+from src.SqliteDatabase import SqliteDatabase
 
 # logging configuration
 logging.basicConfig(
@@ -12,11 +13,16 @@ logging.basicConfig(
 
 def main():
     # connection settings
-    db = Database.from_file()
+    # True to read the SQLite database shared by several contest PCs (see README)
+    use_sqlite = False
+    db = SqliteDatabase.from_file() if use_sqlite else Database.from_file()
+
+    # keep the leaderboard open and add new runs as they are stored
+    follow = False
 
     # leaderboard
-    if len(db.runs) > 0:
-        db.show_leaderboard(n_max=20, ev_metric=EvaluationMetric.RATIO, title="Insgesamt")
+    if len(db) > 0 or follow:
+        db.show_leaderboard(n_max=20, ev_metric=EvaluationMetric.RATIO, follow=follow, title="Insgesamt")
         db.sort(ev_metric=EvaluationMetric.RATIO)
         db.print_runs()
     else:
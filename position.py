@@ -1,9 +1,12 @@
 from src.CircleContest import Database, EvaluationMetric
+from src.SqliteDatabase import SqliteDatabase
 
 
 def main():
     # read database
-    db = Database.from_file()
+    # True to read the SQLite database shared by several contest PCs (see README)
+    use_sqlite = False
+    db = SqliteDatabase.from_file() if use_sqlite else Database.from_file()
 
     """
     ID
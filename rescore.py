@@ -0,0 +1,37 @@
+import logging
+
+from src.Database import Database, EvaluationMetric
+from src.Rescore import rescore, rescore_sqlite
+from src.SqliteDatabase import SqliteDatabase
+
+# logging configuration
+logging.basicConfig(
+    format="%(levelname)-8s %(asctime)s.%(msecs)03d - %(message)s",
+    level=logging.INFO,
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+
+
+def main():
+    # scoring rules, as in CircleContest
+    geometric_fit = False
+    outlier_threshold = 4.0
+
+    # worker processes, None for one per CPU
+    workers = None
+
+    # rescore db/db.sqlite instead of db/db.csv, as in contest.py
+    use_sqlite = False
+
+    score = rescore_sqlite if use_sqlite else rescore
+    report = score(geometric_fit=geometric_fit, outlier_threshold=outlier_threshold, workers=workers)
+    print(report)
+
+    # new leaderboard
+    db = SqliteDatabase.from_file() if use_sqlite else Database.from_file()
+    db.sort(ev_metric=EvaluationMetric.RATIO)
+    db.print_runs()
+
+
+if __name__ == "__main__":
+    main()
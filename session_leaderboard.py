@@ -1,6 +1,7 @@
 import logging
 
 from src.CircleContest import Database, EvaluationMetric
+from src.SqliteDatabase import SqliteDatabase
 
 # logging configuration
 logging.basicConfig(
@@ -12,7 +13,9 @@ logging.basicConfig(
 
 def main():
     # read database
-    db = Database.from_file()
+    # True to read the SQLite database shared by several contest PCs (see README)
+    use_sqlite = False
+    db = SqliteDatabase.from_file() if use_sqlite else Database.from_file()
 
     """
     Session
@@ -20,9 +23,12 @@ def main():
     session = "GAF 8b"
     db_s = db.get_session(session=session)
 
+    # keep the leaderboard open and add new runs of the session as they are stored
+    follow = False
+
     # leaderboard
-    if len(db_s.runs) > 0:
-        db_s.show_leaderboard(n_max=20, ev_metric=EvaluationMetric.RATIO, title=session)
+    if len(db_s) > 0 or follow:
+        db_s.show_leaderboard(n_max=20, ev_metric=EvaluationMetric.RATIO, follow=follow, title=session)
         db_s.sort(ev_metric=EvaluationMetric.RATIO)
         db_s.print_runs()
     else:
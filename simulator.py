@@ -0,0 +1,28 @@
+import logging
+from time import sleep
+
+from src.GeoComSimulator import SimulatedInstrument, SimulatorConfig, serve_pty
+
+# logging configuration
+logging.basicConfig(
+    format="%(levelname)-8s %(asctime)s.%(msecs)03d - %(message)s",
+    level=logging.INFO,
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+
+
+def main():
+    # simulated total station, use the printed device as com-port in contest.py
+    config = SimulatorConfig(latency=0.02, baud=115200, dropout_rate=0.0, zero_distance_rate=0.02)
+    name, _ = serve_pty(SimulatedInstrument(config))
+    print(f"Simulated total station on: {name}")
+
+    try:
+        while True:
+            sleep(1)
+    except KeyboardInterrupt:
+        logging.info("Simulator stopped.")
+
+
+if __name__ == "__main__":
+    main()
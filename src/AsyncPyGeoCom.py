@@ -0,0 +1,382 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.pygeocom import (
+    BOOLE,
+    MAX_TRANSACTION_ID,
+    REPLY_DECODERS,
+    Angles,
+    ATRRecognitionMode,
+    EDMMeasurementMode,
+    EGLIntensity,
+    FineAdjustPositionMode,
+    GeoComStatistics,
+    LockInStatus,
+    OnOff,
+    PositionMode,
+    PowerPath,
+    PrismType,
+    TMCInclinationMode,
+    TMCMeasurementMode,
+    decode_parameters,
+    decode_string,
+    default_return_code_handler,
+    encode_request,
+    lDirection,
+    noop_return_code_handler,
+    parse_reply_header,
+)
+
+logger = logging.getLogger("root")
+
+
+class AsyncSerialStream:
+    """asyncio stream over a blocking serial port.
+
+    Works with ``serial.Serial`` or anything else offering ``write`` and
+    ``readline``. Reads and writes run on their own worker thread each, so a
+    pending ``readline`` never holds back the next request.
+    """
+
+    def __init__(self, port) -> None:
+        self._port = port
+        self._reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="geocom-rx")
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="geocom-tx")
+
+    async def readline(self) -> bytes:
+        return await asyncio.get_running_loop().run_in_executor(self._reader, self._port.readline)
+
+    def at_eof(self) -> bool:
+        # a serial read that times out returns b"", the port stays usable
+        return False
+
+    async def write(self, data: bytes) -> None:
+        await asyncio.get_running_loop().run_in_executor(self._writer, self._port.write, data)
+
+    async def close(self) -> None:
+        self._reader.shutdown(wait=False)
+        self._writer.shutdown(wait=False)
+        self._port.close()
+
+
+class AsyncStreamPair:
+    """Adapter for an ``asyncio.StreamReader`` / ``asyncio.StreamWriter`` pair,
+    e.g. a serial server reached over TCP."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._reader = reader
+        self._writer = writer
+
+    async def readline(self) -> bytes:
+        return await self._reader.readline()
+
+    def at_eof(self) -> bool:
+        return self._reader.at_eof()
+
+    async def write(self, data: bytes) -> None:
+        self._writer.write(data)
+        await self._writer.drain()
+
+    async def close(self) -> None:
+        self._writer.close()
+        await self._writer.wait_closed()
+
+
+class AsyncPyGeoCom:
+    """asyncio counterpart of ``PyGeoCom``.
+
+    Every request carries a transaction id. A background task reads the
+    replies and resolves the awaiting callers, so concurrent tasks (tracking,
+    display, health polling) share the link with up to ``max_in_flight``
+    requests outstanding. A request without reply after ``timeout`` seconds
+    raises TimeoutError. Use ``AsyncPyGeoCom.open`` inside a running loop.
+    """
+
+    def __init__(
+        self,
+        stream,
+        debug: bool = False,
+        max_in_flight: int = MAX_TRANSACTION_ID + 1,
+        timeout: float = 5.0,
+    ):
+        if max_in_flight < 1 or max_in_flight > MAX_TRANSACTION_ID + 1:
+            raise ValueError(f"max_in_flight must be between 1 and {MAX_TRANSACTION_ID + 1}")
+        self._stream = stream
+        self._debug = debug
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self._transaction_id = 0
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self.statistics = GeoComStatistics()
+
+    @classmethod
+    async def open(
+        cls,
+        stream,
+        debug: bool = False,
+        max_in_flight: int = MAX_TRANSACTION_ID + 1,
+        timeout: float = 5.0,
+    ) -> "AsyncPyGeoCom":
+        geo = cls(stream, debug=debug, max_in_flight=max_in_flight, timeout=timeout)
+        geo._slots = asyncio.Semaphore(max_in_flight)
+        await stream.write(b"\n")
+        geo._reader_task = asyncio.create_task(geo._read_replies())
+        return geo
+
+    async def close(self) -> None:
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except asyncio.CancelledError:
+                pass
+        self._fail_pending(ConnectionError("Connection closed"))
+        await self._stream.close()
+
+    def _fail_pending(self, exc: Exception) -> None:
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(exc)
+        self._pending.clear()
+
+    async def _read_replies(self) -> None:
+        try:
+            await self._read_reply_loop()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Reading replies failed: {e}")
+            self._fail_pending(e)
+
+    async def _read_reply_loop(self) -> None:
+        while True:
+            d = await self._stream.readline()
+            if self._debug:
+                print(b"<< " + d)
+            if not d:
+                if self._stream.at_eof():
+                    self._fail_pending(ConnectionError("Connection closed by instrument"))
+                    return
+                # a read timeout, each request has its own deadline in _request
+                continue
+
+            try:
+                geocom_return_code, transaction_id, parameters = parse_reply_header(d)
+            except Exception as e:
+                logger.warning(f"Dropping malformed reply {d!r}: {e}")
+                continue
+
+            future = self._pending.pop(transaction_id, None)
+            if future is None or future.done():
+                logger.warning(f"Dropping reply with unknown transaction id {transaction_id}")
+                continue
+            future.set_result((geocom_return_code, parameters, len(d)))
+
+    def _next_transaction_id(self) -> int:
+        while True:
+            self._transaction_id = (self._transaction_id + 1) % (MAX_TRANSACTION_ID + 1)
+            if self._transaction_id not in self._pending:
+                return self._transaction_id
+
+    async def _request(
+        self,
+        rpc_id: int,
+        args: Tuple[Any, ...] = (),
+        return_code_handler: Callable[[int], None] = default_return_code_handler,
+        decoder: Optional[Callable[[List[bytes]], Any]] = None,
+    ) -> Tuple[Any, ...]:
+        if self._reader_task is None:
+            raise RuntimeError("AsyncPyGeoCom is not open, use AsyncPyGeoCom.open()")
+        if self._reader_task.done():
+            raise ConnectionError("Connection closed, no replies are read anymore")
+
+        async with self._slots:
+            transaction_id = self._next_transaction_id()
+            future = asyncio.get_running_loop().create_future()
+            self._pending[transaction_id] = future
+
+            d = encode_request(rpc_id, args, transaction_id)
+            if self._debug:
+                print(b">> " + d)
+            try:
+                sent_time = perf_counter()
+                await self._stream.write(d)
+                geocom_return_code, parameters, reply_len = await asyncio.wait_for(future, self.timeout)
+            except asyncio.TimeoutError:
+                # a late reply finds the future cancelled and is dropped
+                self.statistics.record_timeout(rpc_id, len(d))
+                raise TimeoutError("No reply from instrument") from None
+            finally:
+                self._pending.pop(transaction_id, None)
+
+        rpc_return_code = parameters.partition(b",")[0]
+        self.statistics.record(
+            rpc_id,
+            len(d),
+            reply_len,
+            perf_counter() - sent_time,
+            int(rpc_return_code) if rpc_return_code.strip().isdigit() else -1,
+        )
+
+        return decode_parameters(geocom_return_code, parameters, return_code_handler, decoder)
+
+    async def _request_fields(
+        self,
+        rpc_id: int,
+        args: Tuple[Any, ...] = (),
+        return_code_handler: Callable[[int], None] = default_return_code_handler,
+    ) -> Tuple[Any, ...]:
+        return await self._request(rpc_id, args, return_code_handler, REPLY_DECODERS[rpc_id])
+
+    async def get_software_version(self) -> Tuple[int, int, int]:
+        return await self._request_fields(5034)
+
+    async def get_server_software_version(self) -> Tuple[int, int, int]:
+        return await self._request_fields(110)
+
+    async def get_instrument_name(self) -> str:
+        _, _, instrument_name = await self._request(5004)
+        return decode_string(instrument_name)
+
+    async def check_power(self) -> Tuple[int, PowerPath, PowerPath]:
+        _, _, capacity, active_power, power_suggest = await self._request(5039)
+        return (
+            int(capacity),
+            PowerPath(int(active_power)),
+            PowerPath(int(power_suggest)),
+        )
+
+    async def get_internal_temperature(self) -> float:
+        (internal_temperature,) = await self._request_fields(5011)
+        return internal_temperature
+
+    async def set_send_delay(self, delay_ms: int):
+        await self._request(109, (delay_ms,))
+
+    async def set_egl_intensity(self, intensity: EGLIntensity):
+        await self._request(1059, (intensity.value,))
+
+    async def get_motor_lock_status(self) -> LockInStatus:
+        (motor_lock_status,) = await self._request_fields(6021)
+        return LockInStatus(motor_lock_status)
+
+    async def set_prism_type(self, prism_type: PrismType):
+        await self._request(17008, (prism_type.value,))
+
+    async def set_edm_mode(self, edm_mode: EDMMeasurementMode):
+        await self._request(2020, (edm_mode.value,))
+
+    async def ps_set_range(self, lMinDist: int, lMaxDist: int):
+        await self._request(9047, (lMinDist, lMaxDist))
+
+    async def ps_enable_range(self, bool: BOOLE):
+        await self._request(9048, (bool.value,))
+
+    async def ps_search_window(self):
+        await self._request(9052)
+
+    async def ps_search_next(self, l_direction: lDirection, bool: BOOLE):
+        await self._request(9051, (l_direction.value, bool.value))
+
+    async def set_user_atr_state(self, atr_state: OnOff):
+        await self._request(18005, (atr_state.value,))
+
+    async def get_user_lock_state(self) -> OnOff:
+        _, _, lock_state = await self._request(18008)
+        return OnOff(int(lock_state))
+
+    async def set_user_lock_state(self, lock_state: OnOff):
+        await self._request(18007, (lock_state.value,))
+
+    async def change_face(
+        self,
+        position_mode: PositionMode = PositionMode.NORMAL,
+        atr_mode: ATRRecognitionMode = ATRRecognitionMode.POSITION,
+    ):
+        await self._request(9028, (position_mode.value, atr_mode.value, False))
+
+    async def fine_adjust(self, horizontal_search_range: float, vertical_search_range: float):
+        await self._request(9037, (horizontal_search_range, vertical_search_range, False))
+
+    async def search(self, horizontal_search_range: float, vertical_search_range: float):
+        await self._request(9029, (horizontal_search_range, vertical_search_range, False))
+
+    async def set_fine_adjust_mode(self, fine_adjust_mode: FineAdjustPositionMode):
+        await self._request(9031, (fine_adjust_mode.value,))
+
+    async def lock_in(self):
+        await self._request(9013)
+
+    async def get_search_area(self) -> Tuple[float, float, float, float, bool]:
+        (
+            _,
+            _,
+            horizontal_centre,
+            vertical_centre,
+            horizontal_range,
+            vertical_range,
+            enabled,
+        ) = await self._request(9042)
+        return (
+            float(horizontal_centre),
+            float(vertical_centre),
+            float(horizontal_range),
+            float(vertical_range),
+            bool(enabled),
+        )
+
+    async def set_search_area(
+        self,
+        horizontal_centre: float,
+        vertical_centre: float,
+        horizontal_range: float,
+        vertical_range: float,
+        enabled: bool,
+    ):
+        await self._request(
+            9043,
+            (
+                horizontal_centre,
+                vertical_centre,
+                horizontal_range,
+                vertical_range,
+                enabled,
+            ),
+        )
+
+    async def get_signal(self) -> Tuple[float, int]:
+        return await self._request_fields(2022)
+
+    async def get_face(self) -> int:
+        (face,) = await self._request_fields(2026)
+        return face
+
+    # UNDOCUMENTED MEASUREMENT MODE TMC_GetFullMeas 2167
+    async def get_full_measurement(
+        self, inclination_mode: TMCInclinationMode, wait_time: int = 1000
+    ) -> Tuple[int, float, float, float, float, float, float]:
+        return await self._request_fields(
+            2167,
+            (wait_time, inclination_mode.value),
+            return_code_handler=noop_return_code_handler,
+        )
+
+    async def get_simple_measurement(
+        self, inclination_mode: TMCInclinationMode, wait_time: int = 1000
+    ) -> Tuple[Angles, float]:
+        horizontal, vertical, slope_distance = await self._request_fields(2108, (wait_time, inclination_mode.value))
+        return Angles(horizontal, vertical), slope_distance
+
+    async def get_angles_simple(self, inclination_mode: TMCInclinationMode) -> Angles:
+        return Angles(*await self._request_fields(2107, (inclination_mode.value,)))
+
+    async def do_measure(self, measurement_mode: TMCMeasurementMode, inclination_mode: TMCInclinationMode):
+        await self._request(2008, (measurement_mode.value, inclination_mode.value))
+
+    async def beep_alarm_normal(self):
+        await self._request(11003)
@@ -1,14 +1,15 @@
 import logging
-import time as t
 from pathlib import Path
-from typing import Tuple
+from typing import Optional, Tuple
 
 import keyboard
 import matplotlib.image as mpimg
 import matplotlib.pyplot as plt
 import numpy as np
 
+from src.CircleFit import geometric_circle_fit, robust_circle_fit
 from src.Database import Database, EvaluationMetric
+from src.RateController import RateController
 from src.Run import Run
 from src.TotalStation import TotalStation
 
@@ -18,10 +19,28 @@ logger = logging.getLogger("root")
 
 
 class CircleContest:
-    def __init__(self, ts: TotalStation, ev_metric: EvaluationMetric = EvaluationMetric.STD) -> None:
+    def __init__(
+        self,
+        ts: TotalStation,
+        ev_metric: EvaluationMetric = EvaluationMetric.STD,
+        sample_rate: Optional[float] = None,
+        render_rate: Optional[float] = 20.0,
+        database: Optional[Database] = None,
+        geometric_fit: bool = False,
+        outlier_threshold: Optional[float] = 4.0,
+    ) -> None:
         self.ts = ts
         self.metric = ev_metric
-        self.database = Database.from_file()
+        # target rates [Hz], None for as fast as possible
+        self.sample_rate = sample_rate
+        self.render_rate = render_rate
+        # score with the geometric instead of the algebraic circle fit
+        self.geometric_fit = geometric_fit
+        # points further from the robust circle than this many residual scales
+        # are dropped before the evaluation, None to keep all points
+        self.outlier_threshold = outlier_threshold
+        # e.g. a SqliteDatabase shared with other contest PCs, db.csv by default
+        self.database = database if database is not None else Database.from_file()
 
         try:
             self.logo = mpimg.imread("./assets/logo-geodaesie.png")
@@ -80,37 +99,69 @@ class CircleContest:
         fig = plt.figure(figsize=(10, 5))
         plt.get_current_fig_manager().full_screen_toggle()
 
+        # measurements are polled in the background, this loop only collects and renders them
+        samples = self.ts.start_acquisition(rate=self.sample_rate)
+        render = RateController(self.render_rate, sleep=plt.pause)
+
         # do until space key is pressed
         while True:
             if keyboard.is_pressed("space"):
                 logger.warning("Interrupted")
                 self.ts.stop_tracking()
+                self.ts.collect_points(samples)
+                logger.info(f"Render rate: {render.report()}")
                 plt.close(fig)
                 self.process_run(session=session, name=name)
                 break
             try:
-                self.ts.add_point()
-                self.ts.kinematic_animation()
+                self.ts.collect_points(samples)
+                self.ts.kinematic_animation(info=f"Messrate: {self.ts.acquisition_rate.report()}{self.live_score()}")
             except Exception as e:
                 logger.error(e)
                 self.ts.stop_tracking()
             except KeyboardInterrupt:
                 logger.warning("Interrupted")
                 self.ts.stop_tracking()
-            t.sleep(0.05)
+            render.tick()
+
+    def live_score(self) -> str:
+        # current circle of the run, from the running sums of the fit
+        solution = self.ts.fit.solve()
+        sigma = self.ts.fit.sigma
+        if solution is None or sigma is None:
+            return ""
+        return f", r = {solution[2]:.3f} m, σ ≈ {sigma:.3f} m"
 
     def process_run(self, *, session: str, name: str) -> Run:
         # evaluate run
-        if len(self.ts.x_vals) > 3 and len(self.ts.x_vals) == len(self.ts.y_vals):
+        solution = self.ts.fit.solve()
+        if len(self.ts.x_vals) > 3 and len(self.ts.x_vals) == len(self.ts.y_vals) and solution is not None:
             logger.info("Processing run...")
             x = np.array(self.ts.x_vals)
             y = np.array(self.ts.y_vals)
-            x_c, y_c, r = circle_fit(x, y)
-
+            # same solution as circle_fit(x, y), kept up to date while measuring
+            x_c, y_c, r = solution
+
+            # exclude blunders, e.g. multipath or a brief loss of lock, from the evaluation
+            x_in, y_in = x, y
+            n_outliers = 0
+            if self.outlier_threshold is not None:
+                *_, inliers = robust_circle_fit(x, y, threshold=self.outlier_threshold)
+                n_outliers = len(x) - np.count_nonzero(inliers)
+                if n_outliers and len(x) - n_outliers > 3:
+                    x_in, y_in = x[inliers], y[inliers]
+                    x_c, y_c, r = circle_fit(x_in, y_in)
+                    logger.info(f"Excluded {n_outliers} outliers")
+                else:
+                    n_outliers = 0
+            if self.geometric_fit:
+                x_c, y_c, r = geometric_circle_fit(x_in, y_in)
+
+            # the whole trajectory is stored, a rescore finds the outliers again
             coords = np.c_[x - x_c, y - y_c]
 
             # standard deviation
-            v = np.sqrt(np.power(x - x_c, 2) + np.power(y - y_c, 2)) - r
+            v = np.sqrt(np.power(x_in - x_c, 2) + np.power(y_in - y_c, 2)) - r
             sigma = np.sqrt((v.T @ v) / (len(v) - 3))
 
             # add run
@@ -120,6 +171,7 @@ class CircleContest:
                 circ_radius=r,
                 circ_std=sigma,
                 coords=coords,
+                n_outliers=n_outliers,
             )
 
             self.database.insert_run(run)
@@ -132,9 +184,10 @@ class CircleContest:
         # circle of run
         cx, cy = gen_circle(1)
 
-        # get position of run in total
+        # get position of run in total, including the runs of other contest PCs
+        self.database.refresh()
         pos_global = self.database.position(id=run.id, ev_metric=self.metric)
-        num_runs_global = len(self.database.runs)
+        num_runs_global = len(self.database)
 
         fig, ax = plt.subplots(1, 1, figsize=(10, 12))
         # plt.get_current_fig_manager().window.state("zoomed")
@@ -0,0 +1,322 @@
+import math
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+class StreamingCircleFit:
+    """
+    Algebraic (Kåsa) circle fit of a growing set of points, as ``circle_fit``.
+
+    Keeps the running sums of the normal equations, so adding or removing a
+    point is O(1) and the current centre, radius and sigma can be read at
+    any time. Coordinates are taken relative to the first point to keep the
+    sums well conditioned. ``sigma`` is derived from the algebraic residuals
+    (d² - r² ≈ 2r (d - r)), a first order approximation of the geometric
+    sigma of ``process_run``.
+    """
+
+    def __init__(self) -> None:
+        self.clear()
+
+    def clear(self) -> None:
+        self.n = 0
+        self._origin: Optional[Tuple[float, float]] = None
+        # sums of x, y, z = x² + y² and their products
+        self._sx = self._sy = self._sz = 0.0
+        self._sxx = self._syy = self._sxy = 0.0
+        self._sxz = self._syz = self._szz = 0.0
+        self._solution: Optional[Tuple[float, float, float, float]] = None
+
+    def _update(self, x: float, y: float, sign: float) -> None:
+        if self._origin is None:
+            self._origin = (x, y)
+        x -= self._origin[0]
+        y -= self._origin[1]
+        z = x * x + y * y
+        self.n += int(sign)
+        self._sx += sign * x
+        self._sy += sign * y
+        self._sz += sign * z
+        self._sxx += sign * x * x
+        self._syy += sign * y * y
+        self._sxy += sign * x * y
+        self._sxz += sign * x * z
+        self._syz += sign * y * z
+        self._szz += sign * z * z
+        self._solution = None
+
+    def add(self, x: float, y: float) -> None:
+        self._update(x, y, 1.0)
+
+    def remove(self, x: float, y: float) -> None:
+        """Remove a previously added point, e.g. the oldest one of a sliding window."""
+        self._update(x, y, -1.0)
+
+    def _solve(self) -> Optional[Tuple[float, float, float, float]]:
+        if self._solution is None and self.n >= 3:
+            # normal equations of A = [-2x, -2y, 1], l = -(x² + y²)
+            N = np.array(
+                [
+                    [4 * self._sxx, 4 * self._sxy, -2 * self._sx],
+                    [4 * self._sxy, 4 * self._syy, -2 * self._sy],
+                    [-2 * self._sx, -2 * self._sy, self.n],
+                ]
+            )
+            b = np.array([2 * self._sxz, 2 * self._syz, -self._sz])
+            try:
+                x_c, y_c, c = np.linalg.solve(N, b).tolist()
+            except np.linalg.LinAlgError:
+                return None
+            r2 = x_c**2 + y_c**2 - c
+            if r2 <= 0:
+                return None
+            self._solution = (x_c, y_c, math.sqrt(r2), c)
+        return self._solution
+
+    def solve(self) -> Optional[Tuple[float, float, float]]:
+        """Centre and radius (x_c, y_c, r), None for less than 3 points or a degenerate set."""
+        solution = self._solve()
+        if solution is None:
+            return None
+        x_c, y_c, r, _ = solution
+        return x_c + self._origin[0], y_c + self._origin[1], r
+
+    @property
+    def sigma(self) -> Optional[float]:
+        solution = self._solve()
+        if solution is None or self.n <= 3:
+            return None
+        x_c, y_c, r, c = solution
+        # sum of (z - 2 x_c x - 2 y_c y + c)² expanded into the running sums
+        sum_e2 = (
+            self._szz
+            + 4 * x_c**2 * self._sxx
+            + 4 * y_c**2 * self._syy
+            + c**2 * self.n
+            - 4 * x_c * self._sxz
+            - 4 * y_c * self._syz
+            + 2 * c * self._sz
+            + 8 * x_c * y_c * self._sxy
+            - 4 * c * x_c * self._sx
+            - 4 * c * y_c * self._sy
+        )
+        return math.sqrt(max(sum_e2, 0.0) / (self.n - 3)) / (2 * r)
+
+
+def _segments(x: np.ndarray, y: np.ndarray, offsets: np.ndarray) -> tuple:
+    """Trajectory index of every point, point counts, first points and coordinates relative to them."""
+    offsets = np.asarray(offsets, dtype=np.intp)
+    counts = np.diff(offsets)
+    ids = np.repeat(np.arange(len(counts)), counts)
+    # relative to the first point of each trajectory, keeps the sums well conditioned
+    first = np.minimum(offsets[:-1], max(len(x) - 1, 0))
+    x0 = x[first] if len(x) else np.zeros(len(counts))
+    y0 = y[first] if len(y) else np.zeros(len(counts))
+    return ids, counts, x0, y0, x - x0[ids], y - y0[ids]
+
+
+def _solve_batch(N: np.ndarray, b: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    # singular systems would fail the whole batch, solve them as identity and drop them
+    valid[valid] = np.abs(np.linalg.det(N[valid])) > np.finfo(np.float64).tiny
+    N[~valid] = np.eye(3)
+    return np.linalg.solve(N, b[:, :, None])[:, :, 0]
+
+
+def _kasa_batch(xs: np.ndarray, ys: np.ndarray, ids: np.ndarray, counts: np.ndarray) -> tuple:
+    """Algebraic fit in relative coordinates, returns x_c, y_c, r and the mask of valid solutions."""
+    m = len(counts)
+
+    def total(weights: np.ndarray) -> np.ndarray:
+        return np.bincount(ids, weights=weights, minlength=m)
+
+    z = xs**2 + ys**2
+    sx, sy, sz = total(xs), total(ys), total(z)
+    sxx, syy, sxy = total(xs * xs), total(ys * ys), total(xs * ys)
+    sxz, syz = total(xs * z), total(ys * z)
+
+    # normal equations of A = [-2x, -2y, 1], l = -(x² + y²) per trajectory
+    N = np.empty((m, 3, 3))
+    N[:, 0, 0] = 4 * sxx
+    N[:, 0, 1] = N[:, 1, 0] = 4 * sxy
+    N[:, 0, 2] = N[:, 2, 0] = -2 * sx
+    N[:, 1, 1] = 4 * syy
+    N[:, 1, 2] = N[:, 2, 1] = -2 * sy
+    N[:, 2, 2] = counts
+    b = np.stack([2 * sxz, 2 * syz, -sz], axis=1)
+
+    valid = counts >= 3
+    p = _solve_batch(N, b, valid)
+    x_c, y_c = p[:, 0], p[:, 1]
+    r2 = x_c**2 + y_c**2 - p[:, 2]
+    valid &= r2 > 0
+    return x_c, y_c, np.sqrt(np.where(valid, r2, np.nan)), valid
+
+
+def _sigma_batch(
+    xs: np.ndarray, ys: np.ndarray, ids: np.ndarray, counts: np.ndarray, x_c: np.ndarray, y_c: np.ndarray, r: np.ndarray
+) -> np.ndarray:
+    # geometric residuals as in process_run
+    v = np.hypot(xs - x_c[ids], ys - y_c[ids]) - r[ids]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sigma = np.sqrt(np.bincount(ids, weights=v * v, minlength=len(counts)) / (counts - 3))
+    sigma[counts <= 3] = np.nan
+    return sigma
+
+
+def circle_fit_batch(
+    x: np.ndarray, y: np.ndarray, offsets: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    ``circle_fit`` and the sigma of ``process_run`` for many trajectories at once.
+
+    The trajectories are concatenated in ``x`` and ``y``, trajectory i spans
+    ``offsets[i]:offsets[i + 1]`` (``offsets`` has one entry more than there
+    are trajectories, the last one is ``len(x)``). All normal equations are
+    built with ``np.bincount`` and solved in one batched call. Returns the
+    arrays x_c, y_c, r and sigma, NaN where a trajectory has too few points
+    (sigma needs more than 3) or is degenerate.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    ids, counts, x0, y0, xs, ys = _segments(x, y, offsets)
+    x_c, y_c, r, valid = _kasa_batch(xs, ys, ids, counts)
+    x_c = np.where(valid, x_c, np.nan)
+    y_c = np.where(valid, y_c, np.nan)
+    return x_c + x0, y_c + y0, r, _sigma_batch(xs, ys, ids, counts, x_c, y_c, r)
+
+
+def geometric_circle_fit_batch(
+    x: np.ndarray, y: np.ndarray, offsets: np.ndarray, max_iter: int = 20, tol: float = 1e-10
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Geometric circle fit (least squares of the orthogonal distances) of many trajectories.
+
+    Same input and output as ``circle_fit_batch``. Starts from the algebraic
+    solution and runs Levenberg-Marquardt steps on all trajectories at once,
+    each trajectory stops once its step is below ``tol`` (relative to the
+    radius), all of them after ``max_iter`` iterations. sigma is the
+    minimized RMS distance with 3 unknowns.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    ids, counts, x0, y0, xs, ys = _segments(x, y, offsets)
+    m = len(counts)
+    x_c, y_c, r, valid = _kasa_batch(xs, ys, ids, counts)
+    x_c = np.where(valid, x_c, 0.0)
+    y_c = np.where(valid, y_c, 0.0)
+    r = np.where(valid, r, 1.0)
+
+    def total(weights: np.ndarray) -> np.ndarray:
+        return np.bincount(ids, weights=weights, minlength=m)
+
+    def cost(x_c: np.ndarray, y_c: np.ndarray, r: np.ndarray) -> np.ndarray:
+        v = np.hypot(xs - x_c[ids], ys - y_c[ids]) - r[ids]
+        return total(v * v)
+
+    damping = np.full(m, 1e-3)
+    active = valid.copy()
+    current = cost(x_c, y_c, r)
+    for _ in range(max_iter):
+        if not active.any():
+            break
+        dx = xs - x_c[ids]
+        dy = ys - y_c[ids]
+        d = np.hypot(dx, dy)
+        d[d == 0] = np.finfo(np.float64).tiny
+        # jacobian of v = d - r by (x_c, y_c, r)
+        jx, jy = -dx / d, -dy / d
+        v = d - r[ids]
+        N = np.empty((m, 3, 3))
+        N[:, 0, 0] = total(jx * jx)
+        N[:, 0, 1] = N[:, 1, 0] = total(jx * jy)
+        N[:, 0, 2] = N[:, 2, 0] = -total(jx)
+        N[:, 1, 1] = total(jy * jy)
+        N[:, 1, 2] = N[:, 2, 1] = -total(jy)
+        N[:, 2, 2] = counts
+        g = -np.stack([total(jx * v), total(jy * v), -total(v)], axis=1)
+        # Levenberg-Marquardt: scale the diagonal by (1 + damping)
+        N[:, [0, 1, 2], [0, 1, 2]] *= (1 + damping)[:, None]
+
+        solved = active.copy()
+        step = _solve_batch(N, g, solved)
+        candidate = cost(x_c + step[:, 0], y_c + step[:, 1], r + step[:, 2])
+        better = solved & (candidate <= current)
+        x_c = np.where(better, x_c + step[:, 0], x_c)
+        y_c = np.where(better, y_c + step[:, 1], y_c)
+        r = np.where(better, r + step[:, 2], r)
+        current = np.where(better, candidate, current)
+        damping = np.where(better, damping / 10, damping * 10)
+
+        # converged, or no descent possible anymore
+        small = np.linalg.norm(step, axis=1) <= tol * (1 + np.abs(r))
+        active &= solved & ~small & (damping < 1e10)
+
+    r = np.abs(r)
+    x_c = np.where(valid, x_c, np.nan)
+    y_c = np.where(valid, y_c, np.nan)
+    r = np.where(valid, r, np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sigma = np.sqrt(current / (counts - 3))
+    sigma[(counts <= 3) | ~valid] = np.nan
+    return x_c + x0, y_c + y0, r, sigma
+
+
+def geometric_circle_fit(
+    x: np.ndarray, y: np.ndarray, max_iter: int = 20, tol: float = 1e-10
+) -> Tuple[float, float, float]:
+    """Geometric counterpart of ``circle_fit``, see ``geometric_circle_fit_batch``."""
+    x_c, y_c, r, _ = geometric_circle_fit_batch(x, y, [0, len(x)], max_iter=max_iter, tol=tol)
+    return float(x_c[0]), float(y_c[0]), float(r[0])
+
+
+def circle_fit_padded(
+    x: np.ndarray, y: np.ndarray, mask: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """``circle_fit_batch`` for trajectories padded to one (m, k) array, ``mask`` marks the valid points."""
+    mask = np.asarray(mask, dtype=bool)
+    offsets = np.r_[0, np.cumsum(mask.sum(axis=1))]
+    return circle_fit_batch(np.asarray(x)[mask], np.asarray(y)[mask], offsets)
+
+
+def weighted_circle_fit(x: np.ndarray, y: np.ndarray, w: np.ndarray) -> Tuple[float, float, float]:
+    """``circle_fit`` with a weight per point."""
+    # relative to the first point, keeps the normal equations well conditioned
+    x0, y0 = x[0], y[0]
+    xs, ys = x - x0, y - y0
+    A = np.c_[-2 * xs, -2 * ys, np.ones(len(xs))]
+    l = -(xs**2 + ys**2)
+    Aw = A * w[:, None]
+    x_c, y_c, c = np.linalg.solve(Aw.T @ A, Aw.T @ l)
+    return x_c + x0, y_c + y0, np.sqrt(x_c**2 + y_c**2 - c)
+
+
+def robust_circle_fit(
+    x: np.ndarray, y: np.ndarray, threshold: float = 4.0, max_iter: int = 10, min_scale: float = 1e-3
+) -> Tuple[float, float, float, np.ndarray]:
+    """
+    Circle fit with outlier rejection, for blunders such as multipath or a lost lock.
+
+    Iteratively reweighted ``circle_fit`` with Tukey's biweight on the
+    geometric residuals about their median, scaled by their MAD (at least
+    ``min_scale`` [m]). Points further than ``threshold`` scales from the
+    circle are outliers. Returns x_c, y_c, r and the mask of the inliers.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    w = np.ones(len(x))
+    inliers = None
+    for _ in range(max_iter):
+        x_c, y_c, r = weighted_circle_fit(x, y, w)
+        v = np.hypot(x - x_c, y - y_c) - r
+        # about their median: blunders bias the radius of the first fits, which
+        # would shift all residuals beyond the cut-off
+        v -= np.median(v)
+        scale = max(1.4826 * np.median(np.abs(v)), min_scale)
+        # biweight with the usual 95 % efficiency tuning constant
+        u = v / (4.685 * scale)
+        w = np.where(np.abs(u) < 1, (1 - u**2) ** 2, 0.0)
+        previous, inliers = inliers, np.abs(v) <= threshold * scale
+        if previous is not None and np.array_equal(previous, inliers):
+            break
+    return x_c, y_c, r, inliers
@@ -1,14 +1,22 @@
+import io
 import logging
+import os
 import uuid
-from dataclasses import dataclass, field
+from csv import QUOTE_NONE
 from enum import Enum, auto
 from pathlib import Path
+from typing import BinaryIO, Dict, Optional, Tuple
 
 import numpy as np
 import pandas as pd
 from matplotlib import pyplot as plt
 
+from src.RankIndex import RankIndex
 from src.Run import Run
+from src.RunLog import RunLog
+from src.RunTable import RunTable
+from src.Snapshot import fingerprint, read_snapshot, write_snapshot
+from src.TrajectoryStore import TrajectoryStore
 
 logger = logging.getLogger("root")
 
@@ -18,109 +26,328 @@ class EvaluationMetric(Enum):
     RATIO = auto()
 
 
-@dataclass
+# columns of db.csv as written by Run.__str__, each line ends with a comma
+# (older lines end after circ_std, their n_outliers is empty)
+CSV_COLUMNS = ("session", "id", "time", "name", "circ_radius", "circ_std", "n_outliers")
+# sessions and times repeat, categories parse each distinct value once
+CSV_DTYPES = {
+    "session": "category",
+    "id": object,
+    "time": "category",
+    "name": object,
+    "circ_radius": float,
+    "circ_std": float,
+    # float, since it is empty on older lines
+    "n_outliers": float,
+}
+
+
+def read_log(filename: str, offset: int = 0) -> Tuple[pd.DataFrame, int]:
+    """
+    Parse the complete lines of db.csv after byte ``offset``, including tombstones.
+
+    Returns the records and the offset after the last complete line.
+    """
+    with open(filename, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+    # a line still being written is read next time
+    data = data[: data.rfind(b"\n") + 1]
+    return parse_log(io.BytesIO(data)), offset + len(data)
+
+
+def parse_log(source: BinaryIO) -> pd.DataFrame:
+    """Parse db.csv records in one pass with the C engine of pandas."""
+    try:
+        log = pd.read_csv(
+            source,
+            header=None,
+            names=CSV_COLUMNS,
+            usecols=range(len(CSV_COLUMNS)),
+            dtype=CSV_DTYPES,
+            # only the missing n_outliers of older lines, a name like "NA" stays a name
+            keep_default_na=False,
+            na_values={"n_outliers": [""]},
+            # fields are written unquoted, quotes typed into a name are part of it
+            quoting=QUOTE_NONE,
+            # the default float parser is within ~1e-14 of float(), round_trip
+            # would cost a third of the parse for digits nobody reads
+            engine="c",
+        )
+    except pd.errors.EmptyDataError:
+        log = pd.DataFrame({c: [] for c in CSV_COLUMNS}).astype(CSV_DTYPES)
+    log["n_outliers"] = log["n_outliers"].fillna(0).astype(np.int32)
+    return log
+
+
+def is_tombstone(log: pd.DataFrame) -> pd.Series:
+    # see src/RunLog.py
+    return log["session"] == ""
+
+
+def read_columns(filename: str) -> pd.DataFrame:
+    """Runs of db.csv, without the deleted runs."""
+    return apply_tombstones(read_log(filename)[0])
+
+
+def apply_tombstones(log: pd.DataFrame) -> pd.DataFrame:
+    tombstone = is_tombstone(log)
+    return log[~tombstone & ~log["id"].isin(log.loc[tombstone, "id"])]
+
+
 class Database:
-    runs: list[Run] = field(default_factory=list)
+    def __init__(
+        self,
+        runs: Optional[list[Run]] = None,
+        *,
+        table: Optional[RunTable] = None,
+        trajectories: Optional[TrajectoryStore] = None,
+        log: Optional[RunLog] = None,
+        session: Optional[str] = None,
+    ) -> None:
+        # columnar store, see src/RunTable.py
+        self.table = table if table is not None else RunTable()
+        # journal of inserts and deletions in db.csv
+        self.log = log if log is not None else RunLog()
+        # coords of the runs, read lazily by get_run
+        self.trajectories = trajectories if trajectories is not None else TrajectoryStore()
+        for run in runs or []:
+            self.table.append(run)
+        # (metric, session or None for all runs) -> ranking, built on first use
+        self._ranks: Dict[Tuple[EvaluationMetric, Optional[str]], RankIndex] = {}
+        # session view of get_session, None for all runs
+        self.session = session
+        # bytes of db.csv read so far and the fingerprint before them, see refresh
+        self._offset = 0
+        self._fingerprint: Optional[str] = None
+
+    def __len__(self) -> int:
+        return len(self.table)
 
     @classmethod
-    def from_file(cls: "Database", *, filename: str = "./db/db.csv") -> "Database":
+    def from_file(cls: "Database", *, filename: str = "./db/db.csv", snapshot_after: int = 1000) -> "Database":
+        """
+        Read db.csv, starting from the snapshot next to it (see src/Snapshot.py).
+
+        Only the records appended since the snapshot are parsed. A new
+        snapshot is written after a full read or once ``snapshot_after``
+        records were replayed.
+        """
+        csv = Path(filename)
+        snapshot_file = csv.with_suffix(".snapshot")
+
+        log = RunLog(filename)
+        trajectories = TrajectoryStore(csv.parent / "trajectories")
+
         # try to read an existing database
-        runs = []
         try:
-            with open(filename) as f:
-                in_file = f.readlines()
+            with log.file_lock:
+                snapshot = read_snapshot(snapshot_file, csv)
+                table, offset, log.tombstones = snapshot if snapshot is not None else (RunTable(), 0, 0)
+                tail, end = read_log(filename, offset)
+                end_fingerprint = fingerprint(csv, end)
         except FileNotFoundError as e:
             logger.info("There is no database yet!")
             Path("./db").mkdir(exist_ok=True)
-            return cls()
-
-        # create database
-        for l in in_file:
-            line_split = l.split(",")
-            session = line_split[0]
-            id = line_split[1]
-            time = line_split[2]
-            name = line_split[3]
-            radius = float(line_split[4])
-            std = float(line_split[5])
-
-            run = Run(
-                session=session,
-                id=id,
-                time=time,
-                name=name,
-                circ_radius=radius,
-                circ_std=std,
+            return cls(trajectories=trajectories, log=log)
+
+        db = cls(table=table, trajectories=trajectories, log=log)
+        db._offset, db._fingerprint = end, end_fingerprint
+        db._replay(tail)
+        logger.info(f"Read {len(db)} runs! ({len(tail)} records after the snapshot)")
+
+        if len(tail) >= snapshot_after or (snapshot is None and len(tail) > 0):
+            try:
+                write_snapshot(snapshot_file, db.table, end, db.log.tombstones, end_fingerprint)
+            except Exception as e:
+                logger.error(f"Failed to write snapshot: {e}")
+        return db
+
+    def _replay(self, tail: pd.DataFrame) -> int:
+        """Apply records of db.csv, runs already present are skipped. Returns the number of changed runs."""
+        # deletions of earlier runs first, then the new runs
+        tombstones = is_tombstone(tail)
+        deleted = [id for id in tail.loc[tombstones, "id"].tolist() if id in self.table]
+        if deleted:
+            self.table = self.table.take(
+                np.delete(np.arange(len(self.table)), [self.table.row(id) for id in deleted])
             )
-            runs.append(run)
-        logger.info(f"Read {len(runs)} runs!")
-        return cls(runs)
+            for index in self._ranks.values():
+                for id in deleted:
+                    index.remove(id)
+        # own deletions are counted twice, the count only schedules the compaction
+        self.log.tombstones += int(tombstones.sum())
+
+        columns = apply_tombstones(tail)
+        if self.session is not None:
+            columns = columns[columns["session"] == self.session]
+        # own inserts come back through the file, nothing to skip on a full read
+        if len(self.table):
+            columns = columns[np.array([id not in self.table for id in columns["id"].tolist()], dtype=bool)]
+        start = len(self.table)
+        self.table.extend(
+            session_categories=columns["session"].cat.categories.tolist(),
+            session_codes=columns["session"].cat.codes.to_numpy(),
+            ids=columns["id"].tolist(),
+            times=columns["time"].tolist(),
+            names=columns["name"].tolist(),
+            radii=columns["circ_radius"].to_numpy(),
+            stds=columns["circ_std"].to_numpy(),
+            n_outliers=columns["n_outliers"].to_numpy(),
+        )
+        if self._ranks:
+            for i in range(start, len(self.table)):
+                self._rank(self.table.run(i))
+        return len(deleted) + len(columns)
+
+    def refresh(self) -> int:
+        """
+        Read the runs other processes appended to db.csv since the last read.
+
+        Only the new bytes are parsed; if the file was rewritten (compacted)
+        it is read again in full. Returns the number of changed runs.
+        """
+        csv = self.log.filename
+        with self.log.file_lock:
+            try:
+                size = os.path.getsize(csv)
+            except FileNotFoundError:
+                return 0
+            unchanged = size >= self._offset and self._fingerprint_ok()
+            if unchanged and size == self._offset:
+                return 0
+            if unchanged:
+                tail, end = read_log(csv, self._offset)
+            else:
+                logger.info("Database was rewritten, reading it again!")
+                tail, end = read_log(csv)
+                self.table = RunTable(capacity=max(len(tail), 1024))
+                self._ranks = {}
+                self.log.tombstones = 0
+            self._offset = end
+            self._fingerprint = fingerprint(csv, end)
+        return self._replay(tail)
+
+    def _fingerprint_ok(self) -> bool:
+        return self._fingerprint is None or fingerprint(self.log.filename, self._offset) == self._fingerprint
+
+    @property
+    def runs(self) -> list[Run]:
+        """Materializes all runs, prefer the columns or ``get_run``."""
+        return [self._run(i) for i in range(len(self.table))]
+
+    def _run(self, i: int) -> Run:
+        run = self.table.run(i)
+        if run.coords.ndim == 0:
+            coords = self.trajectories.get(run.session, run.id)
+            if coords is not None:
+                run.coords = coords
+        return run
 
     @property
     def sessions(self) -> list:
-        return [r.session for r in self.runs]
+        return self.table.sessions
 
     @property
     def ids(self) -> list:
-        return [r.id for r in self.runs]
+        return self.table.ids
 
     @property
     def names(self) -> list:
-        return [r.name for r in self.runs]
+        return self.table.names
+
+    @property
+    def times(self) -> list:
+        return self.table.times
 
     @property
     def ratios(self) -> np.ndarray:
         """
         Returns ratios of standard deviation and radius
         """
-        return np.array([(r.circ_std / r.circ_radius) for r in self.runs])
+        return self.table.ratios
 
     @property
     def radii(self) -> np.ndarray:
-        return np.array([r.circ_radius for r in self.runs])
+        return self.table.radii
 
     @property
     def stds(self) -> np.ndarray:
-        return np.array([r.circ_std for r in self.runs])
+        return self.table.stds
 
     def get_run(self, id: uuid.UUID) -> Run:
-        ids = self.ids
-        return self.runs[ids.index(id)]
+        return self._run(self.table.row(id))
 
     def get_session(self, session: str) -> "Database":
-        runs = [r for r in self.runs if r.session == session]
-        return Database(runs=runs)
+        db = Database(
+            table=self.table.take(self.table.session_rows(session)),
+            trajectories=self.trajectories,
+            log=self.log,
+            session=session,
+        )
+        db._offset, db._fingerprint = self._offset, self._fingerprint
+        return db
+
+    def metric_values(self, ev_metric: EvaluationMetric) -> np.ndarray:
+        if ev_metric == EvaluationMetric.STD:
+            return self.stds
+        elif ev_metric == EvaluationMetric.RATIO:
+            return self.ratios
+
+    def _rank_index(self, ev_metric: EvaluationMetric, session: Optional[str] = None) -> RankIndex:
+        index = self._ranks.get((ev_metric, session))
+        if index is None:
+            values = self.metric_values(ev_metric)
+            if session is None:
+                index = RankIndex.build(self.ids, values.tolist())
+            else:
+                rows = self.table.session_rows(session)
+                index = RankIndex.build([self.ids[i] for i in rows.tolist()], values[rows].tolist())
+            self._ranks[(ev_metric, session)] = index
+        return index
+
+    def _rank(self, run: Run) -> None:
+        for (ev_metric, session), index in self._ranks.items():
+            if session is None or session == run.session:
+                index.insert(run.id, metric_value(run, ev_metric))
 
     def insert_run(self, run: Run) -> None:
-        self.runs.append(run)
+        self.table.append(run)
+        self._rank(run)
         try:
             # write to file
-            with open("./db/db.csv", "a+") as out_file:
-                out_file.write(f"{run}\n")
+            self.log.append(str(run))
         except Exception as e:
             logger.error(f"Failed to save run: {e}")
+        if run.coords.ndim:
+            try:
+                self.trajectories.append(run.session, run.id, run.coords)
+            except Exception as e:
+                logger.error(f"Failed to save trajectory: {e}")
 
     def del_run(self, id: uuid.UUID) -> None:
-        self.runs = [r for r in self.runs if r.id != id]
+        try:
+            self.log.delete(id)
+        except Exception as e:
+            logger.error(f"Failed to delete run: {e}")
+        try:
+            row = self.table.row(id)
+        except ValueError:
+            return
+        self.table = self.table.take(np.delete(np.arange(len(self.table)), row))
+        for index in self._ranks.values():
+            index.remove(id)
 
     def position(self, *, id: uuid.UUID, ev_metric: EvaluationMetric) -> int:
-        self.sort(ev_metric=ev_metric)
-        ids = self.ids
-        return ids.index(id) + 1
+        return self._rank_index(ev_metric).position(id)
 
     def session_position(self, *, session: str, id: uuid.UUID, ev_metric: EvaluationMetric) -> int:
-        db_session = self.get_session(session=session)
-        return db_session.position(id=id, ev_metric=ev_metric)
+        return self._rank_index(ev_metric, session).position(id)
 
     def sort(self, ev_metric: EvaluationMetric = EvaluationMetric.STD) -> None:
-        if ev_metric == EvaluationMetric.STD:
-            # sort by std
-            idx = np.argsort(self.stds)
-        elif ev_metric == EvaluationMetric.RATIO:
-            # sort by ratio of standard deviation and radius
-            idx = np.argsort(self.ratios)
-
-        self.runs = [self.runs[i] for i in idx]
+        # sort by std or by ratio of standard deviation and radius
+        idx = np.argsort(self.metric_values(ev_metric), kind="stable")
+        self.table = self.table.take(idx)
 
     def print_runs(self) -> None:
         print(
@@ -132,14 +359,33 @@ class Database:
                 "======================"
             )
         )
-        for i, r in enumerate(self.runs):
-            print(
-                (f"{i + 1:<3} {r.name:<20} {r.time}: " f"Radius: {r.circ_radius:.3f} m, " f"Sigma: {r.circ_std:.4f} m")
-            )
-
-    def show_leaderboard(self, *, n_max: int = 10, ev_metric=EvaluationMetric, title: str = "Insgesamt") -> None:
-        self.sort(ev_metric=ev_metric)
+        for i, (name, time, radius, std) in enumerate(
+            zip(self.names, self.times, self.radii.tolist(), self.stds.tolist())
+        ):
+            print((f"{i + 1:<3} {name:<20} {time}: " f"Radius: {radius:.3f} m, " f"Sigma: {std:.4f} m"))
+
+    def leaderboard(self, *, n_max: int, ev_metric: EvaluationMetric) -> list[tuple[str, float]]:
+        """Names and metric values of the best ``n_max`` runs, without sorting the database."""
+        values = self.metric_values(ev_metric)
+        rows = [self.table.row(id) for id in self._rank_index(ev_metric).top(n_max)]
+        return [(self.names[i], float(values[i])) for i in rows]
+
+    def show_leaderboard(
+        self,
+        *,
+        n_max: int = 10,
+        ev_metric=EvaluationMetric,
+        title: str = "Insgesamt",
+        follow: bool = False,
+        interval: float = 0.5,
+    ) -> None:
+        """
+        Show the best ``n_max`` runs as a table.
 
+        With ``follow`` the window stays open and the table is updated every
+        ``interval`` seconds with the runs appended to the database since
+        (see ``refresh``), until the window is closed.
+        """
         fig, ax = plt.subplots(1, 1, figsize=(13, 9))
         plt.get_current_fig_manager().window.state("zoomed")
 
@@ -148,47 +394,60 @@ class Database:
         ax.axis("off")
         ax.axis("tight")
 
-        n = min(len(self.runs), n_max)
-
-        numbers = list(range(1, n + 1))
+        # followed tables keep n_max rows, so new runs have a place to appear
+        n = n_max if follow else min(len(self), n_max)
 
         if ev_metric == EvaluationMetric.STD:
-            df = pd.DataFrame([numbers, self.names[:n], self.stds[:n]])
-            df = df.transpose()
-            df.update(df[[2]].applymap("{:,.3f}".format))
-            tab = ax.table(
-                cellText=df.values,
-                colLabels=[
-                    "$\\bf{Platzierung}$",
-                    "$\\bf{Name}$",
-                    "$\\bf{Abweichung [m]}$",
-                ],
-                loc="center",
-                cellLoc="center",
-            )
-            plt.title(f"Rundester Kreis\n({title})", fontsize=30)
+            metric_label = "$\\bf{Abweichung [m]}$"
         elif ev_metric == EvaluationMetric.RATIO:
-            df = pd.DataFrame([numbers, self.names[:n], self.ratios[:n]])
-            df = df.transpose()
-            df.update(df[[2]].applymap("{:,.3f}".format))
-            tab = ax.table(
-                cellText=df.values,
-                colLabels=[
-                    "$\\bf{Platzierung}$",
-                    "$\\bf{Name}$",
-                    "$\\bf{Std. Abw / Radius [m]}$",
-                ],
-                loc="center",
-                cellLoc="center",
-            )
-            plt.title(f"Rundester Kreis\n({title})", fontsize=30)
+            metric_label = "$\\bf{Std. Abw / Radius [m]}$"
+        tab = ax.table(
+            cellText=[["", "", ""]] * n,
+            colLabels=[
+                "$\\bf{Platzierung}$",
+                "$\\bf{Name}$",
+                metric_label,
+            ],
+            loc="center",
+            cellLoc="center",
+        )
+        plt.title(f"Rundester Kreis\n({title})", fontsize=30)
         tab.auto_set_font_size(False)
         tab.set_fontsize(20)
         tab.scale(1, 2)
 
+        def fill() -> None:
+            entries = self.leaderboard(n_max=n, ev_metric=ev_metric)
+            for i in range(n):
+                if i < len(entries):
+                    name, value = entries[i]
+                    cells = (f"{i + 1}", name, f"{value:,.3f}")
+                else:
+                    cells = ("", "", "")
+                # row 0 holds the column labels
+                for j, text in enumerate(cells):
+                    tab[i + 1, j].get_text().set_text(text)
+
+        fill()
         fig.tight_layout()
 
-        plt.show()
+        if not follow:
+            plt.show()
+            return
+
+        # only the runs appended since the last refresh are read
+        while plt.fignum_exists(fig.number):
+            if self.refresh():
+                fill()
+                fig.canvas.draw_idle()
+            plt.pause(interval)
+
+
+def metric_value(run: Run, ev_metric: EvaluationMetric) -> float:
+    if ev_metric == EvaluationMetric.STD:
+        return run.circ_std
+    elif ev_metric == EvaluationMetric.RATIO:
+        return run.circ_std / run.circ_radius
 
 
 def gen_circle(r: float) -> None:
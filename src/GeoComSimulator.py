@@ -0,0 +1,335 @@
+import logging
+import math
+import os
+import random
+import threading
+from collections import deque
+from dataclasses import dataclass
+from time import monotonic, sleep
+from typing import Deque, Optional, Tuple
+
+from src.pygeocom import ReturnCode, TMCMeasurementMode
+
+logger = logging.getLogger("root")
+
+
+@dataclass
+class SimulatorConfig:
+    # link and instrument behaviour
+    latency: float = 0.02  # processing time per request [s]
+    latency_jitter: float = 0.005  # uniform jitter added to the latency [s]
+    baud: Optional[int] = 115200  # throttles the transfer, None for unlimited
+    dropout_rate: float = 0.0  # probability that a request is never answered
+    zero_distance_rate: float = 0.0  # probability of a 2167 reply without distance
+    edm_rate: Optional[float] = None  # distances per second in tracking, None for always available
+    # synthetic prism moving on a circle around (east, north)
+    east: float = 0.0
+    north: float = 8.0
+    radius: float = 2.0
+    angular_speed: float = 0.5  # [rad/s]
+    height: float = -0.3  # prism height relative to the trunnion axis [m]
+    angle_noise: float = 1e-5  # [rad]
+    distance_noise: float = 0.002  # [m]
+    seed: Optional[int] = None
+
+
+class SimulatedInstrument:
+    """
+    Answers GeoCOM ASCII requests (``%R1Q``) like a tracking total station.
+
+    The prism moves on the circle of the config. Distances are only available
+    while a tracking program has been started with ``do_measure`` (2008).
+    """
+
+    def __init__(self, config: Optional[SimulatorConfig] = None) -> None:
+        self.config = config if config is not None else SimulatorConfig()
+        self._random = random.Random(self.config.seed)
+        self._start = monotonic()
+
+        self.send_delay = 0.0
+        self.wait = 0.0  # time the last request waited for a distance
+        self.tracking = False
+        self.locked = False
+        self.atr = 0
+        self.lock_state = 0
+        self.prism_type = 3
+        self.edm_mode = 2
+        self.fine_adjust_mode = 0
+        self.face = 0
+        self.egl = 0
+        self.search_area = (0.0, 1.5708, 6.283, 0.6, 1)
+        self.ps_range = (1, 20)
+        self.ps_range_enabled = 0
+
+    def prism_position(self, t: float) -> Tuple[float, float, float]:
+        phi = self.config.angular_speed * t
+        x = self.config.east + self.config.radius * math.sin(phi)
+        y = self.config.north + self.config.radius * math.cos(phi)
+        return x, y, self.config.height
+
+    def polar(self, t: float) -> Tuple[float, float, float]:
+        x, y, z = self.prism_position(t)
+        hd = math.hypot(x, y)
+        hz = math.atan2(x, y) % (2 * math.pi)
+        v = math.atan2(hd, z)
+        sd = math.hypot(hd, z)
+
+        # face two reads the telescope through the zenith
+        if self.face == 1:
+            hz = (hz + math.pi) % (2 * math.pi)
+            v = 2 * math.pi - v
+
+        hz += self._random.gauss(0, self.config.angle_noise)
+        v += self._random.gauss(0, self.config.angle_noise)
+        sd += self._random.gauss(0, self.config.distance_noise)
+        return hz, v, sd
+
+    def handle(self, request: bytes) -> Optional[bytes]:
+        """Return the reply line for a request line, None for a dropout."""
+        request = request.strip()
+        if not request.startswith(b"%R1Q,"):
+            return None
+        if self._random.random() < self.config.dropout_rate:
+            return None
+
+        try:
+            header, parameters = request.split(b":", 1)
+            _, rpc_id, *transaction_id = header.split(b",")
+            rpc_id = int(rpc_id)
+            transaction_id = int(transaction_id[0]) if transaction_id else 0
+            args = [a.strip(b'"') for a in parameters.split(b",")] if parameters else []
+        except ValueError:
+            rc = ReturnCode.GRC_COM_CANT_DECODE_REQ.value
+            return f"%R1P,{rc},0:{rc}\r\n".encode("ascii")
+
+        rc, values = self._call(rpc_id, args)
+        if rc == ReturnCode.GRC_COM_PROC_UNAVAIL:
+            return f"%R1P,{rc.value},{transaction_id}:{rc.value}\r\n".encode("ascii")
+        fields = ",".join([str(rc.value)] + [str(v) for v in values])
+        return f"%R1P,0,{transaction_id}:{fields}\r\n".encode("ascii")
+
+    def _call(self, rpc_id: int, args: list) -> Tuple[ReturnCode, tuple]:
+        t = monotonic() - self._start
+        ok = ReturnCode.GRC_OK
+
+        # measurements
+        if rpc_id == 2167:
+            hz, v, sd = self.polar(t)
+            if self.tracking and self.config.edm_rate:
+                # wait for the next distance of the EDM, at most wait_time
+                wait = math.ceil(t * self.config.edm_rate) / self.config.edm_rate - t
+                wait_time = int(args[0]) / 1000
+                self.wait = min(wait, wait_time)
+                if wait > wait_time:
+                    return ReturnCode.GRC_TMC_ANGLE_OK, (hz, v, 1e-5, 0.0, 0.0, 1e-5, 0.0, int(t * 1000))
+            if not self.tracking or self._random.random() < self.config.zero_distance_rate:
+                return ReturnCode.GRC_TMC_ANGLE_OK, (hz, v, 1e-5, 0.0, 0.0, 1e-5, 0.0, int(t * 1000))
+            return ok, (hz, v, 1e-5, 0.0, 0.0, 1e-5, sd, int(t * 1000))
+        if rpc_id == 2108:
+            hz, v, sd = self.polar(t)
+            if not self.tracking:
+                return ReturnCode.GRC_TMC_ANGLE_OK, (hz, v, 0.0)
+            return ok, (hz, v, sd)
+        if rpc_id == 2107:
+            hz, v, _ = self.polar(t)
+            return ok, (hz, v)
+        if rpc_id == 2008:
+            mode = int(args[0])
+            self.tracking = mode in (
+                TMCMeasurementMode.DISTANCE_TRACKING.value,
+                TMCMeasurementMode.DISTANCE_RAPID_TRACKING.value,
+                TMCMeasurementMode.RED_LASER_TRACKING.value,
+            )
+            return ok, ()
+        if rpc_id == 2022:
+            return ok, (0.8 if self.locked else 0.0, int(t * 1000))
+        if rpc_id == 2020:
+            self.edm_mode = int(args[0])
+            return ok, ()
+        if rpc_id == 2026:
+            return ok, (self.face,)
+
+        # instrument information
+        if rpc_id == 5034:
+            return ok, (3, 0, 5)
+        if rpc_id == 110:
+            return ok, (1, 0, 0)
+        if rpc_id == 5039:
+            return ok, (85, 1, 1)
+        if rpc_id == 5003:
+            return ok, (999999,)
+        if rpc_id == 5004:
+            return ok, ('"TS-SIM"',)
+        if rpc_id == 5011:
+            return ok, (21.5,)
+
+        # ATR, lock and search
+        if rpc_id == 18005:
+            self.atr = int(args[0])
+            return ok, ()
+        if rpc_id == 18006:
+            return ok, (self.atr,)
+        if rpc_id == 18007:
+            self.lock_state = int(args[0])
+            if not self.lock_state:
+                self.locked = False
+            return ok, ()
+        if rpc_id == 18008:
+            return ok, (self.lock_state,)
+        if rpc_id == 9013:
+            if not self.lock_state:
+                return ReturnCode.AUT_RC_NOT_ENABLED, ()
+            self.locked = True
+            return ok, ()
+        if rpc_id == 6021:
+            return ok, (1 if self.locked else 0,)
+        if rpc_id in (9029, 9037, 9051, 9052):
+            return ok, ()
+        if rpc_id == 9030:
+            return ok, (self.fine_adjust_mode,)
+        if rpc_id == 9031:
+            self.fine_adjust_mode = int(args[0])
+            return ok, ()
+        if rpc_id == 9042:
+            return ok, self.search_area
+        if rpc_id == 9043:
+            self.search_area = tuple(float(a) for a in args[:4]) + (int(args[4]),)
+            return ok, ()
+        if rpc_id == 9047:
+            self.ps_range = (int(args[0]), int(args[1]))
+            return ok, ()
+        if rpc_id == 9048:
+            self.ps_range_enabled = int(args[0])
+            return ok, ()
+        if rpc_id == 9028:
+            self.face = 1 - self.face
+            return ok, ()
+
+        # configuration and peripherals
+        if rpc_id == 17008:
+            self.prism_type = int(args[0])
+            return ok, ()
+        if rpc_id == 17009:
+            return ok, (self.prism_type,)
+        if rpc_id == 1059:
+            self.egl = int(args[0])
+            return ok, ()
+        if rpc_id == 109:
+            self.send_delay = int(args[0]) / 1000
+            return ok, ()
+        if rpc_id in (1, 1004, 11003, 11004, 20000, 20001):
+            return ok, ()
+
+        return ReturnCode.GRC_COM_PROC_UNAVAIL, ()
+
+    def response_delay(self, request_len: int, reply_len: int) -> float:
+        """Delay of the reply to the request handled last."""
+        delay = self.config.latency + self._random.uniform(0, self.config.latency_jitter) + self.send_delay
+        delay += self.wait
+        self.wait = 0.0
+        if self.config.baud:
+            # 8N1: ten bits on the wire per byte
+            delay += (request_len + reply_len) * 10 / self.config.baud
+        return delay
+
+
+class SimulatorStream:
+    """
+    In-memory stand-in for ``serial.Serial`` connected to a simulated instrument.
+
+    Requests are answered one after another like on a real link: a reply is
+    readable once the instrument finished all earlier requests plus the
+    configured latency and transfer time. ``readline`` returns ``b""`` after
+    ``timeout`` seconds, like pyserial does.
+    """
+
+    def __init__(self, instrument: Optional[SimulatedInstrument] = None, timeout: float = 1.0) -> None:
+        self.instrument = instrument if instrument is not None else SimulatedInstrument()
+        self.timeout = timeout
+        self._buffer = b""
+        self._replies: Deque[Tuple[float, bytes]] = deque()
+        self._busy_until = 0.0
+        self._cond = threading.Condition()
+
+    def write(self, data: bytes) -> int:
+        with self._cond:
+            self._buffer += data
+            *lines, self._buffer = self._buffer.split(b"\n")
+            for line in lines:
+                reply = self.instrument.handle(line)
+                if reply is None:
+                    continue
+                start = max(monotonic(), self._busy_until)
+                self._busy_until = start + self.instrument.response_delay(len(line) + 1, len(reply))
+                self._replies.append((self._busy_until, reply))
+            self._cond.notify_all()
+        return len(data)
+
+    def readline(self) -> bytes:
+        deadline = monotonic() + self.timeout
+        with self._cond:
+            while True:
+                now = monotonic()
+                if self._replies and self._replies[0][0] <= now:
+                    return self._replies.popleft()[1]
+                if now >= deadline:
+                    return b""
+                wait = deadline - now
+                if self._replies:
+                    wait = min(wait, self._replies[0][0] - now)
+                self._cond.wait(wait)
+
+    @property
+    def in_waiting(self) -> int:
+        now = monotonic()
+        with self._cond:
+            return sum(len(r) for ready, r in self._replies if ready <= now)
+
+    def reset_input_buffer(self) -> None:
+        with self._cond:
+            self._replies.clear()
+
+    def reset_output_buffer(self) -> None:
+        with self._cond:
+            self._buffer = b""
+
+    def close(self) -> None:
+        self.reset_input_buffer()
+        self.reset_output_buffer()
+
+
+def serve_pty(instrument: Optional[SimulatedInstrument] = None) -> Tuple[str, threading.Thread]:
+    """
+    Expose a simulated instrument on a pseudo terminal (POSIX only).
+
+    Returns the device name to pass as com port (e.g. to ``Connection``) and
+    the daemon thread answering the requests.
+    """
+    import tty
+
+    instrument = instrument if instrument is not None else SimulatedInstrument()
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    name = os.ttyname(slave)
+
+    def serve() -> None:
+        buffer = b""
+        while True:
+            try:
+                data = os.read(master, 1024)
+            except OSError:
+                logger.info("Simulator: pty closed")
+                return
+            buffer += data
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                reply = instrument.handle(line)
+                if reply is None:
+                    continue
+                sleep(instrument.response_delay(len(line) + 1, len(reply)))
+                os.write(master, reply)
+
+    thread = threading.Thread(target=serve, name="geocom-simulator", daemon=True)
+    thread.start()
+    logger.info(f"Simulator: listening on {name}")
+    return name, thread
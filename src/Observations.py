@@ -0,0 +1,61 @@
+from typing import Tuple
+
+import numpy as np
+
+# one reply of get_full_measurement, time tagged with the host clock
+OBSERVATION_DTYPE = np.dtype(
+    [
+        ("host_time", np.float64),  # host clock when the reply arrived [s]
+        ("measure_time", np.int64),  # instrument clock of the measurement [ms]
+        ("hz", np.float64),  # horizontal direction [rad]
+        ("v", np.float64),  # zenith angle [rad]
+        ("sd", np.float64),  # slope distance [m], 0 if none was available
+        ("acc_incl", np.float64),  # accuracy of the inclination [rad]
+        ("cross_incl", np.float64),  # cross inclination [rad]
+        ("length_incl", np.float64),  # length inclination [rad]
+    ]
+)
+
+
+class ObservationBuffer:
+    """Growable array of raw observations (``OBSERVATION_DTYPE``)."""
+
+    def __init__(self, capacity: int = 4096) -> None:
+        self._data = np.empty(capacity, dtype=OBSERVATION_DTYPE)
+        self._n = 0
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def data(self) -> np.ndarray:
+        """View of the stored observations."""
+        return self._data[: self._n]
+
+    def clear(self) -> None:
+        self._n = 0
+
+    def _reserve(self, n: int) -> None:
+        if self._n + n > len(self._data):
+            data = np.empty(max(2 * len(self._data), self._n + n), dtype=OBSERVATION_DTYPE)
+            data[: self._n] = self._data[: self._n]
+            self._data = data
+
+    def append(self, observation: tuple) -> None:
+        self._reserve(1)
+        self._data[self._n] = observation
+        self._n += 1
+
+    def extend(self, observations: list) -> np.ndarray:
+        """Append a list of observation tuples, returns a view of the new records."""
+        self._reserve(len(observations))
+        start = self._n
+        self._data[start : start + len(observations)] = observations
+        self._n += len(observations)
+        return self._data[start : self._n]
+
+
+def polar_to_cartesian(observations: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Local x (east) and y (north) of observations in the instrument system."""
+    horizontal_distance = observations["sd"] * np.sin(observations["v"])
+    return horizontal_distance * np.sin(observations["hz"]), horizontal_distance * np.cos(observations["hz"])
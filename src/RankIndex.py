@@ -0,0 +1,103 @@
+from bisect import bisect_left, insort
+from itertools import accumulate
+from typing import Dict, List, Optional, Sequence, Tuple
+
+Key = Tuple[float, int]
+
+
+class RankIndex:
+    """
+    Sorted ranking of run ids by a metric value.
+
+    Keys are (value, seq) with a running sequence number, so equal values
+    rank in insertion order. They are kept in sorted chunks of at most
+    ``2 * load`` keys: insert and remove binary search the last keys of
+    the chunks, then the chunk, and only shift keys within the chunk, so
+    they cost O(log n + load). ``position`` adds the keys of the chunks
+    before, their running counts are rebuilt (O(n / load), in C) on the
+    first position after a change.
+    """
+
+    def __init__(self, load: int = 1000) -> None:
+        self._load = load
+        self._chunks: List[List[Key]] = []
+        # last key of each chunk
+        self._maxes: List[Key] = []
+        # keys before each chunk, None after a change
+        self._offsets: Optional[List[int]] = None
+        self._len = 0
+        self._key_of: Dict[str, Key] = {}
+        self._id_of: Dict[int, str] = {}
+        self._seq = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    @classmethod
+    def build(cls, ids: Sequence[str], values: Sequence[float], load: int = 1000) -> "RankIndex":
+        index = cls(load)
+        index._key_of = {id: (value, seq) for seq, (id, value) in enumerate(zip(ids, values))}
+        index._id_of = {seq: id for id, (_, seq) in index._key_of.items()}
+        keys = sorted(index._key_of.values())
+        index._chunks = [keys[i : i + load] for i in range(0, len(keys), load)]
+        index._maxes = [chunk[-1] for chunk in index._chunks]
+        index._len = len(keys)
+        index._seq = len(keys)
+        return index
+
+    def insert(self, id: str, value: float) -> None:
+        self.remove(id)
+        key = (value, self._seq)
+        self._seq += 1
+        self._key_of[id] = key
+        self._id_of[key[1]] = id
+
+        self._offsets = None
+        self._len += 1
+        if not self._chunks:
+            self._chunks.append([key])
+            self._maxes.append(key)
+            return
+        i = min(bisect_left(self._maxes, key), len(self._maxes) - 1)
+        chunk = self._chunks[i]
+        insort(chunk, key)
+        self._maxes[i] = chunk[-1]
+        if len(chunk) > 2 * self._load:
+            self._chunks[i : i + 1] = [chunk[: self._load], chunk[self._load :]]
+            self._maxes[i : i + 1] = [chunk[self._load - 1], chunk[-1]]
+
+    def remove(self, id: str) -> None:
+        key = self._key_of.pop(id, None)
+        if key is None:
+            return
+        del self._id_of[key[1]]
+
+        self._offsets = None
+        self._len -= 1
+        i = bisect_left(self._maxes, key)
+        chunk = self._chunks[i]
+        del chunk[bisect_left(chunk, key)]
+        if chunk:
+            self._maxes[i] = chunk[-1]
+        else:
+            del self._chunks[i]
+            del self._maxes[i]
+
+    def top(self, n: int) -> List[str]:
+        """Ids of the first ``n`` ranks."""
+        ids = []
+        for chunk in self._chunks:
+            if len(ids) >= n:
+                break
+            ids.extend(self._id_of[seq] for _, seq in chunk[: n - len(ids)])
+        return ids
+
+    def position(self, id: str) -> int:
+        """1-based rank of ``id``, raises ValueError if it is not ranked."""
+        key = self._key_of.get(id)
+        if key is None:
+            raise ValueError(f"{id} is not in the ranking")
+        if self._offsets is None:
+            self._offsets = [0, *accumulate(len(chunk) for chunk in self._chunks)]
+        i = bisect_left(self._maxes, key)
+        return self._offsets[i] + bisect_left(self._chunks[i], key) + 1
@@ -0,0 +1,72 @@
+from collections import deque
+from time import perf_counter, sleep
+from typing import Callable, Optional
+
+
+class RateController:
+    """
+    Paces a loop to a target rate.
+
+    Call ``tick()`` once per iteration after the work is done. It sleeps only
+    for what is left of the period, so request latency and render time count
+    against the period instead of adding to it. With ``rate=None`` the loop
+    runs as fast as possible and ``tick()`` only measures. A late iteration
+    starts the next period right away instead of trying to catch up.
+    """
+
+    def __init__(
+        self,
+        rate: Optional[float] = None,
+        window: int = 50,
+        sleep: Callable[[float], None] = sleep,
+    ) -> None:
+        if rate is not None and rate <= 0:
+            raise ValueError("rate must be positive or None")
+        self.rate = rate
+        self._sleep = sleep
+        self._period = 1 / rate if rate else 0.0
+        self._deadline: Optional[float] = None
+        self._ticks = deque(maxlen=window)
+        self._busy = deque(maxlen=window)
+        self.iterations = 0
+
+    def reset(self) -> None:
+        self._deadline = None
+        self._ticks.clear()
+        self._busy.clear()
+        self.iterations = 0
+
+    def tick(self) -> None:
+        now = perf_counter()
+        if self._ticks:
+            self._busy.append(now - self._ticks[-1])
+
+        if self._deadline is None:
+            self._deadline = now
+        self._deadline += self._period
+        if now < self._deadline:
+            self._sleep(self._deadline - now)
+        else:
+            # running late, start the next period now
+            self._deadline = now
+
+        self._ticks.append(perf_counter())
+        self.iterations += 1
+
+    @property
+    def achieved_rate(self) -> float:
+        """Iterations per second over the last ``window`` iterations."""
+        if len(self._ticks) < 2:
+            return 0.0
+        return (len(self._ticks) - 1) / (self._ticks[-1] - self._ticks[0])
+
+    @property
+    def busy_time(self) -> float:
+        """Mean work time per iteration [s], excluding the sleep."""
+        if not self._busy:
+            return 0.0
+        return sum(self._busy) / len(self._busy)
+
+    def report(self) -> str:
+        target = f"{self.rate:.1f} Hz" if self.rate else "max"
+        return f"{self.achieved_rate:.1f} Hz (target {target}, busy {self.busy_time * 1000:.1f} ms)"
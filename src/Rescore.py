@@ -0,0 +1,228 @@
+import logging
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from pathlib import Path
+from time import monotonic
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.CircleFit import circle_fit_batch, geometric_circle_fit_batch, robust_circle_fit
+from src.Database import Database
+from src.SqliteDatabase import SqliteDatabase
+from src.TrajectoryStore import TrajectoryStore
+
+logger = logging.getLogger("root")
+
+# stores of the worker processes, opened once per process
+_stores: Dict[str, TrajectoryStore] = {}
+
+
+@dataclass
+class RescoreReport:
+    runs: int
+    # runs without a stored trajectory keep their score
+    skipped: int
+    points: int
+    seconds: float
+
+    def __str__(self) -> str:
+        seconds = max(self.seconds, 1e-9)
+        return (
+            f"Rescored {self.runs} runs ({self.skipped} without trajectory kept) in {self.seconds:.2f} s: "
+            f"{self.runs / seconds:.0f} runs/s, {self.points / seconds:.0f} points/s"
+        )
+
+
+def _score_chunk(
+    directory: str, session: str, ids: List[str], geometric_fit: bool, outlier_threshold: Optional[float]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+    """
+    Score the stored trajectories of ``ids`` the way ``CircleContest.process_run`` does.
+
+    Runs in a worker process. Returns radii and stds (NaN for runs without a
+    trajectory), the excluded outliers and the number of points read.
+    """
+    store = _stores.get(directory)
+    if store is None:
+        store = _stores[directory] = TrajectoryStore(directory)
+
+    n_outliers = np.zeros(len(ids), dtype=np.int32)
+    stored = np.zeros(len(ids), dtype=bool)
+    xs, ys = [], []
+    points = 0
+    for i, id in enumerate(ids):
+        coords = store.get(session, id)
+        if coords is None or len(coords) <= 3:
+            continue
+        stored[i] = True
+        points += len(coords)
+        x, y = coords[:, 0], coords[:, 1]
+        if outlier_threshold is not None:
+            *_, inliers = robust_circle_fit(x, y, threshold=outlier_threshold)
+            n = len(x) - np.count_nonzero(inliers)
+            if n and len(x) - n > 3:
+                x, y = x[inliers], y[inliers]
+                n_outliers[i] = n
+        xs.append(x)
+        ys.append(y)
+
+    radii = np.full(len(ids), np.nan)
+    stds = np.full(len(ids), np.nan)
+    if xs:
+        fit = geometric_circle_fit_batch if geometric_fit else circle_fit_batch
+        offsets = np.r_[0, np.cumsum([len(x) for x in xs])]
+        _, _, radii[stored], stds[stored] = fit(np.concatenate(xs), np.concatenate(ys), offsets)
+    return radii, stds, n_outliers, points
+
+
+def _score_runs(
+    directory: str,
+    sessions: List[str],
+    ids: List[str],
+    *,
+    geometric_fit: bool,
+    outlier_threshold: Optional[float],
+    workers: Optional[int],
+    chunk_size: int,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, int]:
+    """
+    Score the runs ``ids`` of ``sessions`` in chunks of one session in a process pool.
+
+    Returns radii, stds and outliers per run, the mask of the runs that had
+    a trajectory (the others are NaN and 0) and the number of points read.
+    """
+    rows_of: Dict[str, List[int]] = {}
+    for i, session in enumerate(sessions):
+        rows_of.setdefault(session, []).append(i)
+    tasks = []
+    for session, rows in rows_of.items():
+        for start in range(0, len(rows), chunk_size):
+            tasks.append((session, np.array(rows[start : start + chunk_size], dtype=np.intp)))
+
+    radii = np.full(len(ids), np.nan)
+    stds = np.full(len(ids), np.nan)
+    n_outliers = np.zeros(len(ids), dtype=np.int32)
+    points = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(
+            _score_chunk,
+            [directory] * len(tasks),
+            [session for session, _ in tasks],
+            [[ids[i] for i in rows] for _, rows in tasks],
+            [geometric_fit] * len(tasks),
+            [outlier_threshold] * len(tasks),
+        )
+        for (_, rows), (r, s, o, p) in zip(tasks, results):
+            radii[rows], stds[rows], n_outliers[rows] = r, s, o
+            points += p
+    return radii, stds, n_outliers, ~np.isnan(radii), points
+
+
+def rescore(
+    filename: str = "./db/db.csv",
+    *,
+    geometric_fit: bool = False,
+    outlier_threshold: Optional[float] = 4.0,
+    workers: Optional[int] = None,
+    chunk_size: int = 500,
+) -> RescoreReport:
+    """
+    Score all runs of db.csv again from their stored trajectories.
+
+    ``geometric_fit`` and ``outlier_threshold`` choose the pipeline as in
+    ``CircleContest``. Chunks of ``chunk_size`` runs of one session are
+    scored in a pool of ``workers`` processes (default one per CPU), each
+    reading the trajectories through its own memory map. The new db.csv is
+    written to a temporary file and swapped in, the previous one is kept as
+    db.bak. Runs other processes appended meanwhile are copied unchanged.
+
+    Stored trajectories hold every measured point, so ``n_outliers`` is
+    found again from them and the same rules give the same scores. An
+    existing db.sqlite is not touched, see ``rescore_sqlite``.
+    """
+    t0 = monotonic()
+    db = Database.from_file(filename=filename)
+    table = db.table
+
+    r, s, o, scored, points = _score_runs(
+        str(db.trajectories.directory),
+        table.sessions,
+        table.ids,
+        geometric_fit=geometric_fit,
+        outlier_threshold=outlier_threshold,
+        workers=workers,
+        chunk_size=chunk_size,
+    )
+    radii = np.where(scored, r, table.radii)
+    stds = np.where(scored, s, table.stds)
+    n_outliers = np.where(scored, o, table.n_outliers)
+    skipped = int(np.count_nonzero(~scored))
+
+    csv = Path(filename)
+    tmp = csv.with_suffix(".rescore")
+    with db.log.file_lock:
+        # appended meanwhile is fine, a rewrite (compaction) would drop the tombstones read since
+        if os.path.getsize(csv) < db._offset or not db._fingerprint_ok():
+            raise RuntimeError(f"{csv} was rewritten while rescoring, please run again")
+        with open(tmp, "w") as dst:
+            for i in range(len(table)):
+                run = replace(
+                    table.run(i),
+                    circ_radius=float(radii[i]),
+                    circ_std=float(stds[i]),
+                    n_outliers=int(n_outliers[i]),
+                )
+                dst.write(f"{run}\n")
+            with open(csv, "rb") as src:
+                src.seek(db._offset)
+                dst.flush()
+                shutil.copyfileobj(src, dst.buffer)
+            dst.flush()
+            os.fsync(dst.fileno())
+        shutil.copyfile(csv, csv.with_suffix(".bak"))
+        os.replace(tmp, csv)
+        # the snapshot holds the old scores
+        csv.with_suffix(".snapshot").unlink(missing_ok=True)
+    db.log.close()
+
+    report = RescoreReport(runs=len(table) - skipped, skipped=skipped, points=points, seconds=monotonic() - t0)
+    logger.info(str(report))
+    return report
+
+
+def rescore_sqlite(
+    filename: str = "./db/db.sqlite",
+    *,
+    geometric_fit: bool = False,
+    outlier_threshold: Optional[float] = 4.0,
+    workers: Optional[int] = None,
+    chunk_size: int = 500,
+) -> RescoreReport:
+    """
+    ``rescore`` for the runs of a SQLite database.
+
+    The new scores are written in one transaction, runs inserted meanwhile
+    keep the scores they were stored with.
+    """
+    t0 = monotonic()
+    db = SqliteDatabase.from_file(filename=filename, csv=None)
+    ids = db.ids
+    r, s, o, scored, points = _score_runs(
+        str(db.trajectories.directory),
+        db.sessions,
+        ids,
+        geometric_fit=geometric_fit,
+        outlier_threshold=outlier_threshold,
+        workers=workers,
+        chunk_size=chunk_size,
+    )
+    db.update_scores([ids[i] for i in np.flatnonzero(scored)], r[scored], s[scored], o[scored])
+    db.connection.close()
+
+    skipped = int(np.count_nonzero(~scored))
+    report = RescoreReport(runs=len(ids) - skipped, skipped=skipped, points=points, seconds=monotonic() - t0)
+    logger.info(str(report))
+    return report
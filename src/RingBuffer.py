@@ -0,0 +1,59 @@
+from threading import Lock
+from typing import Any, List
+
+
+class RingBuffer:
+    """
+    Thread-safe buffer holding the latest ``capacity`` items.
+
+    One producer appends, any number of consumers read independently through
+    their own ``RingBufferReader``. A reader that falls behind by more than
+    ``capacity`` items loses the oldest ones and counts them in ``dropped``.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self._items: List[Any] = [None] * capacity
+        self._written = 0
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return min(self._written, self.capacity)
+
+    @property
+    def written(self) -> int:
+        """Number of items appended since creation."""
+        return self._written
+
+    def append(self, item: Any) -> None:
+        with self._lock:
+            self._items[self._written % self.capacity] = item
+            self._written += 1
+
+    def read_from(self, cursor: int) -> tuple:
+        """Items appended since ``cursor``, the new cursor and the number of lost items."""
+        with self._lock:
+            written = self._written
+            oldest = max(0, written - self.capacity)
+            dropped = max(0, oldest - cursor)
+            start = max(cursor, oldest)
+            items = [self._items[i % self.capacity] for i in range(start, written)]
+        return items, written, dropped
+
+    def reader(self, from_start: bool = False) -> "RingBufferReader":
+        return RingBufferReader(self, 0 if from_start else self._written)
+
+
+class RingBufferReader:
+    def __init__(self, buffer: RingBuffer, cursor: int) -> None:
+        self.buffer = buffer
+        self.cursor = cursor
+        self.dropped = 0
+
+    def read(self) -> List[Any]:
+        """All items appended since the last read."""
+        items, self.cursor, dropped = self.buffer.read_from(self.cursor)
+        self.dropped += dropped
+        return items
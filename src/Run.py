@@ -14,9 +14,15 @@ class Run:
     id: str = field(default_factory=lambda: str(uuid.uuid4()))
     time: str = field(default_factory=lambda: time.strftime("%Y-%m-%d %H:%M"))
     coords: np.ndarray = field(default_factory=lambda: np.zeros((), dtype=np.float64))
+    # points excluded from the evaluation as outliers
+    n_outliers: int = 0
 
     def __str__(self) -> str:
-        return f"{self.session}," f"{self.id},{self.time},{self.name}," f"{self.circ_radius},{self.circ_std},"
+        return (
+            f"{self.session},"
+            f"{self.id},{self.time},{self.name},"
+            f"{self.circ_radius},{self.circ_std},{self.n_outliers},"
+        )
 
     @property
     def unit_circle_coords(self) -> np.ndarray:
@@ -0,0 +1,203 @@
+import atexit
+import logging
+import os
+import threading
+from enum import Enum, auto
+from pathlib import Path
+from time import monotonic
+from typing import Optional, TextIO
+
+from src.FileLock import FileLock
+
+logger = logging.getLogger("root")
+
+# a line with an empty session deletes the run of its id
+TOMBSTONE = ",{id},,,0,0,"
+
+
+class SyncPolicy(Enum):
+    # written to the OS on every record, survives a crash of the process
+    FLUSH = auto()
+    # additionally fsynced by the background thread at most ``group_interval`` later
+    GROUP = auto()
+    # fsynced on every record
+    ALWAYS = auto()
+
+
+class RunLog:
+    """
+    Append-only journal of db.csv.
+
+    Runs are appended as ``Run.__str__`` lines, deletions as tombstone lines
+    (see ``TOMBSTONE``) through a handle kept open. With ``SyncPolicy.GROUP``
+    a background thread fsyncs all records written since the last sync in
+    one go. Once ``compact_after`` tombstones are in the file, the thread
+    rewrites it without the deleted runs and swaps it in atomically. Only
+    copying the records appended meanwhile and the swap block appends.
+    """
+
+    def __init__(
+        self,
+        filename: str = "./db/db.csv",
+        policy: SyncPolicy = SyncPolicy.GROUP,
+        group_interval: float = 0.5,
+        compact_after: int = 100,
+        tombstones: int = 0,
+    ) -> None:
+        self.filename = Path(filename)
+        self.policy = policy
+        self.group_interval = group_interval
+        self.compact_after = compact_after
+
+        self._file: Optional[TextIO] = None
+        # between processes writing the same file, see src/FileLock.py
+        self.file_lock = FileLock(self.filename.with_suffix(".lock"))
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._unsynced = 0
+        # tombstones in the file, triggers the compaction
+        self.tombstones = tombstones
+        self._closed = False
+        self._worker: Optional[threading.Thread] = None
+
+    def _open(self) -> TextIO:
+        # another process compacted the file, append to the new one
+        if self._file is not None and self._replaced():
+            self._file.close()
+            self._file = None
+        # opened on the first write, so read-only users never touch the file
+        if self._file is None:
+            self.filename.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.filename, "a+")
+            if self._worker is None:
+                self._closed = False
+                self._worker = threading.Thread(target=self._work, name="run-log", daemon=True)
+                self._worker.start()
+                atexit.register(self.close)
+        return self._file
+
+    def _replaced(self) -> bool:
+        try:
+            return os.fstat(self._file.fileno()).st_ino != os.stat(self.filename).st_ino
+        except FileNotFoundError:
+            return True
+
+    def append(self, line: str) -> None:
+        with self._lock, self.file_lock:
+            f = self._open()
+            f.write(f"{line}\n")
+            f.flush()
+            if self.policy == SyncPolicy.ALWAYS:
+                os.fsync(f.fileno())
+            else:
+                self._unsynced += 1
+                self._wake.notify()
+
+    def delete(self, id: str) -> None:
+        self.append(TOMBSTONE.format(id=id))
+        with self._lock:
+            self.tombstones += 1
+            self._wake.notify()
+
+    def sync(self) -> None:
+        with self._lock:
+            self._sync()
+
+    def _sync(self) -> None:
+        if self._file is not None and self._unsynced:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            self._wake.notify()
+        if self._worker is not None and self._worker is not threading.current_thread():
+            self._worker.join()
+            self._worker = None
+        with self._lock:
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
+
+    def _work(self) -> None:
+        while True:
+            with self._lock:
+                if self._closed:
+                    return
+                self._wake.wait(self.group_interval)
+                try:
+                    if self.policy == SyncPolicy.GROUP:
+                        self._sync()
+                except Exception as e:
+                    logger.error(f"Run log: {e}")
+                compact = not self._closed and self.tombstones >= self.compact_after
+            # appends go on while the file is rewritten
+            if compact:
+                try:
+                    self._compact()
+                except Exception as e:
+                    logger.error(f"Run log: {e}")
+
+    def _compact(self) -> None:
+        t0 = monotonic()
+        # the records written so far are rewritten without holding the locks
+        with self._lock, self.file_lock:
+            f = self._open()
+            f.flush()
+            end = os.fstat(f.fileno()).st_size
+            inode = os.fstat(f.fileno()).st_ino
+        tmp = self.filename.with_suffix(".compact")
+        try:
+            kept = self._rewrite(tmp, end)
+            with self._lock, self.file_lock:
+                if os.stat(self.filename).st_ino != inode or os.path.getsize(self.filename) < end:
+                    logger.info("Run log: rewritten by another process, compaction skipped")
+                    return
+                # records appended during the rewrite, tombstones among them still apply
+                self._file.flush()
+                tombstones = self._copy_tail(tmp, end)
+                self._file.close()
+                try:
+                    os.replace(tmp, self.filename)
+                except OSError as e:
+                    # e.g. Windows refuses to replace a file other processes have open
+                    logger.warning(
+                        f"Run log: compaction failed, retrying after {self.compact_after} deletions: {e}"
+                    )
+                    tombstones = 0
+                self._file = open(self.filename, "a+")
+                self._unsynced = 0
+                self.tombstones = tombstones
+        finally:
+            tmp.unlink(missing_ok=True)
+        logger.info(f"Run log: compacted to {kept} runs in {monotonic() - t0:.2f} s")
+
+    def _rewrite(self, tmp: Path, end: int) -> int:
+        """Write the first ``end`` bytes of the file without deleted runs to ``tmp``, returns the kept runs."""
+        with open(self.filename, "rb") as src:
+            lines = src.read(end).splitlines(keepends=True)
+        deleted = {l.split(b",", 2)[1] for l in lines if l.startswith(b",")}
+        kept = 0
+        with open(tmp, "wb") as dst:
+            for l in lines:
+                fields = l.split(b",", 2)
+                if len(fields) > 2 and fields[0] and fields[1] not in deleted:
+                    dst.write(l)
+                    kept += 1
+            dst.flush()
+            os.fsync(dst.fileno())
+        return kept
+
+    def _copy_tail(self, tmp: Path, end: int) -> int:
+        """Append the records after ``end`` to ``tmp``, returns the tombstones among them."""
+        with open(self.filename, "rb") as src, open(tmp, "ab") as dst:
+            src.seek(end)
+            tail = src.read()
+            dst.write(tail)
+            dst.flush()
+            os.fsync(dst.fileno())
+        return sum(1 for l in tail.splitlines() if l.startswith(b","))
+
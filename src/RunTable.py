@@ -0,0 +1,198 @@
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from src.Run import Run
+
+
+class RunTable:
+    """
+    Columnar storage of runs.
+
+    The metrics are kept in contiguous arrays and computed once on insert,
+    sessions are stored as codes into a string table. ``Run`` objects are
+    only created by ``run(i)``, coords are kept for runs inserted in this
+    process (None for loaded runs).
+    """
+
+    def __init__(self, capacity: int = 1024) -> None:
+        self._radius = np.empty(capacity, dtype=np.float64)
+        self._std = np.empty(capacity, dtype=np.float64)
+        self._ratio = np.empty(capacity, dtype=np.float64)
+        self._session = np.empty(capacity, dtype=np.int32)
+        self._outliers = np.empty(capacity, dtype=np.int32)
+        self._n = 0
+
+        # string table of the sessions, referenced by _session
+        self.session_table: List[str] = []
+        self._session_codes: Dict[str, int] = {}
+
+        self.ids: List[str] = []
+        self.names: List[str] = []
+        self.times: List[str] = []
+        self.coords: List[Optional[np.ndarray]] = []
+
+        # id -> row and session code -> rows, kept up to date by extend
+        self._row_of: Dict[str, int] = {}
+        self._session_rows: Dict[int, List[int]] = {}
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __contains__(self, id: str) -> bool:
+        return id in self._row_of
+
+    @property
+    def radii(self) -> np.ndarray:
+        return self._radius[: self._n]
+
+    @property
+    def stds(self) -> np.ndarray:
+        return self._std[: self._n]
+
+    @property
+    def ratios(self) -> np.ndarray:
+        """Ratios of standard deviation and radius."""
+        return self._ratio[: self._n]
+
+    @property
+    def n_outliers(self) -> np.ndarray:
+        return self._outliers[: self._n]
+
+    @property
+    def session_codes(self) -> np.ndarray:
+        return self._session[: self._n]
+
+    @property
+    def sessions(self) -> List[str]:
+        return [self.session_table[c] for c in self.session_codes.tolist()]
+
+    def session_code(self, session: str) -> Optional[int]:
+        return self._session_codes.get(session)
+
+    def row(self, id: str) -> int:
+        """Row of run ``id``, raises ValueError if it is not stored."""
+        try:
+            return self._row_of[id]
+        except KeyError:
+            raise ValueError(f"{id} is not in the database") from None
+
+    def session_rows(self, session: str) -> np.ndarray:
+        """Rows of a session in table order."""
+        return np.array(self._session_rows.get(self._session_codes.get(session), []), dtype=np.intp)
+
+    def _encode_session(self, session: str) -> int:
+        code = self._session_codes.get(session)
+        if code is None:
+            code = len(self.session_table)
+            self.session_table.append(session)
+            self._session_codes[session] = code
+        return code
+
+    def _reserve(self, n: int) -> None:
+        capacity = len(self._radius)
+        if self._n + n <= capacity:
+            return
+        capacity = max(2 * capacity, self._n + n)
+        for name in ("_radius", "_std", "_ratio", "_session", "_outliers"):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[: self._n] = old[: self._n]
+            setattr(self, name, new)
+
+    def append(self, run: Run) -> None:
+        self.extend(
+            sessions=[run.session],
+            ids=[run.id],
+            times=[run.time],
+            names=[run.name],
+            radii=[run.circ_radius],
+            stds=[run.circ_std],
+            coords=[run.coords if run.coords.ndim else None],
+            n_outliers=[run.n_outliers],
+        )
+
+    def extend(
+        self,
+        *,
+        sessions: Optional[Sequence[str]] = None,
+        session_categories: Optional[Sequence[str]] = None,
+        session_codes: Optional[np.ndarray] = None,
+        ids: Sequence[str],
+        times: Sequence[str],
+        names: Sequence[str],
+        radii: Sequence[float],
+        stds: Sequence[float],
+        coords: Optional[Sequence[Optional[np.ndarray]]] = None,
+        n_outliers: Optional[Sequence[int]] = None,
+    ) -> None:
+        """
+        Append columns of runs.
+
+        The sessions are given either as ``sessions`` or already encoded as
+        ``session_codes`` into ``session_categories``.
+        """
+        n = len(ids)
+        self._reserve(n)
+        rows = slice(self._n, self._n + n)
+        self._radius[rows] = radii
+        self._std[rows] = stds
+        self._ratio[rows] = self._std[rows] / self._radius[rows]
+        self._outliers[rows] = n_outliers if n_outliers is not None else 0
+        if session_codes is None:
+            # encode each distinct session once
+            uniques, session_codes = np.unique(np.asarray(sessions, dtype=str), return_inverse=True)
+            session_categories = uniques.tolist()
+        codes = np.array([self._encode_session(s) for s in session_categories], dtype=np.int32)
+        self._session[rows] = codes[np.asarray(session_codes, dtype=np.intp).reshape(-1)]
+        self.ids.extend(ids)
+        self.names.extend(names)
+        self.times.extend(times)
+        self.coords.extend(coords if coords is not None else [None] * n)
+        self._index(rows)
+        self._n += n
+
+    def _index(self, rows: slice) -> None:
+        self._row_of.update(zip(self.ids[rows], range(rows.start, rows.stop)))
+        # group the new rows by session, keeping their order
+        codes = self._session[rows]
+        order = np.argsort(codes, kind="stable")
+        bounds = np.flatnonzero(np.diff(codes[order])) + 1
+        for group in np.split(order + rows.start, bounds):
+            if len(group):
+                self._session_rows.setdefault(int(self._session[group[0]]), []).extend(group.tolist())
+
+    def run(self, i: int) -> Run:
+        """Materialize row ``i``."""
+        coords = self.coords[i]
+        return Run(
+            session=self.session_table[self._session[i]],
+            id=self.ids[i],
+            time=self.times[i],
+            name=self.names[i],
+            circ_radius=float(self._radius[i]),
+            circ_std=float(self._std[i]),
+            coords=coords if coords is not None else np.zeros((), dtype=np.float64),
+            n_outliers=int(self._outliers[i]),
+        )
+
+    def take(self, idx: np.ndarray) -> "RunTable":
+        """New table of the rows ``idx``, in that order."""
+        idx = np.asarray(idx, dtype=np.intp)
+        table = RunTable(capacity=max(len(idx), 1))
+        table._radius[: len(idx)] = self.radii[idx]
+        table._std[: len(idx)] = self.stds[idx]
+        table._ratio[: len(idx)] = self.ratios[idx]
+        table._outliers[: len(idx)] = self.n_outliers[idx]
+        # codes stay valid with a copy of the string table
+        table._session[: len(idx)] = self.session_codes[idx]
+        table.session_table = list(self.session_table)
+        table._session_codes = dict(self._session_codes)
+        rows = idx.tolist()
+        table.ids = [self.ids[i] for i in rows]
+        table.names = [self.names[i] for i in rows]
+        table.times = [self.times[i] for i in rows]
+        table.coords = [self.coords[i] for i in rows]
+        table._n = len(idx)
+        table._index(slice(0, len(idx)))
+        return table
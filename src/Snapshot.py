@@ -0,0 +1,89 @@
+import hashlib
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+
+from src.RunTable import RunTable
+
+logger = logging.getLogger("root")
+
+SNAPSHOT_VERSION = 2
+
+# bytes of db.csv before the snapshot offset that must still match
+FINGERPRINT_BYTES = 4096
+
+
+def fingerprint(csv: Path, offset: int) -> str:
+    with open(csv, "rb") as f:
+        f.seek(max(0, offset - FINGERPRINT_BYTES))
+        return hashlib.sha1(f.read(min(offset, FINGERPRINT_BYTES))).hexdigest()
+
+
+def write_snapshot(filename: Path, table: RunTable, offset: int, tombstones: int, csv_fingerprint: str) -> None:
+    """
+    Store the columns of ``table`` as read from the first ``offset`` bytes of db.csv.
+
+    ``csv_fingerprint`` is the ``fingerprint`` of those bytes, taken while
+    they were read: the file may have been rewritten since.
+
+    Plain arrays in an uncompressed npz, strings as fixed width unicode, so
+    loading needs no parsing. Written to a temporary file of its own, so
+    processes starting together do not write into each other's, and swapped in.
+    """
+    fd, tmp = tempfile.mkstemp(dir=filename.parent, prefix=filename.stem, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(
+                f,
+                version=np.int64(SNAPSHOT_VERSION),
+                offset=np.int64(offset),
+                tombstones=np.int64(tombstones),
+                fingerprint=np.str_(csv_fingerprint),
+                radii=table.radii,
+                stds=table.stds,
+                n_outliers=table.n_outliers,
+                session_codes=table.session_codes,
+                session_table=np.array(table.session_table, dtype=str),
+                ids=np.array(table.ids, dtype=str),
+                names=np.array(table.names, dtype=str),
+                times=np.array(table.times, dtype=str),
+            )
+        os.replace(tmp, filename)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def read_snapshot(filename: Path, csv: Path) -> Optional[Tuple[RunTable, int, int]]:
+    """Table, csv offset and tombstone count of the snapshot, None if there is none or it is stale."""
+    try:
+        with np.load(filename, allow_pickle=False) as data:
+            offset = int(data["offset"])
+            if int(data["version"]) != SNAPSHOT_VERSION:
+                return None
+            # the csv was rewritten (e.g. compacted) or truncated since
+            if os.path.getsize(csv) < offset or str(data["fingerprint"]) != fingerprint(csv, offset):
+                logger.info("Snapshot is stale, rebuilding!")
+                return None
+            ids = data["ids"]
+            table = RunTable(capacity=max(len(ids), 1024))
+            table.extend(
+                session_categories=data["session_table"].tolist(),
+                session_codes=data["session_codes"],
+                ids=ids.tolist(),
+                times=data["times"].tolist(),
+                names=data["names"].tolist(),
+                radii=data["radii"],
+                stds=data["stds"],
+                n_outliers=data["n_outliers"],
+            )
+            return table, offset, int(data["tombstones"])
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Failed to read snapshot: {e}")
+        return None
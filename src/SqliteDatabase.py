@@ -0,0 +1,263 @@
+import logging
+import sqlite3
+import uuid
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from src.Database import Database, EvaluationMetric, metric_value, read_columns
+from src.Run import Run
+from src.TrajectoryStore import TrajectoryStore
+
+logger = logging.getLogger("root")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    seq INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    session TEXT NOT NULL,
+    time TEXT NOT NULL,
+    name TEXT NOT NULL,
+    circ_radius REAL NOT NULL,
+    circ_std REAL NOT NULL,
+    ratio REAL NOT NULL,
+    n_outliers INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS runs_session ON runs (session);
+CREATE INDEX IF NOT EXISTS runs_time ON runs (time);
+CREATE INDEX IF NOT EXISTS runs_std ON runs (circ_std);
+CREATE INDEX IF NOT EXISTS runs_ratio ON runs (ratio);
+CREATE INDEX IF NOT EXISTS runs_session_std ON runs (session, circ_std);
+CREATE INDEX IF NOT EXISTS runs_session_ratio ON runs (session, ratio);
+"""
+
+# column of each metric
+METRIC_COLUMNS = {EvaluationMetric.STD: "circ_std", EvaluationMetric.RATIO: "ratio"}
+
+
+class SqliteDatabase(Database):
+    """
+    Database on a SQLite file in WAL mode.
+
+    Readers and one writer at a time can share the file from several
+    processes on the same host. WAL relies on shared memory, the file must
+    not be used from several hosts or over a network file system. Implements the whole interface of ``Database``: lookups and
+    positions are indexed queries, ``sort`` only sets the order of the column
+    properties, printing and the leaderboard display work on these. Equal metric values rank in
+    insertion order, as in ``Database``. Coords stay in the
+    ``TrajectoryStore`` next to the file.
+    """
+
+    def __init__(
+        self,
+        connection: sqlite3.Connection,
+        *,
+        session: Optional[str] = None,
+        trajectories: Optional[TrajectoryStore] = None,
+    ) -> None:
+        # the columns, ranks and journal of Database stay empty, every query goes to the file
+        super().__init__(trajectories=trajectories, session=session)
+        self.connection = connection
+        self._order = "seq"
+        # changes when another connection commits, see refresh
+        self._data_version = self._read_data_version()
+
+    @classmethod
+    def from_file(
+        cls: "SqliteDatabase", *, filename: str = "./db/db.sqlite", csv: Optional[str] = "./db/db.csv"
+    ) -> "SqliteDatabase":
+        """Open or create the database, a new database imports ``csv`` if it exists."""
+        Path(filename).parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(filename, timeout=10.0, isolation_level=None, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(SCHEMA)
+        # databases created before n_outliers was recorded
+        if "n_outliers" not in [c[1] for c in connection.execute("PRAGMA table_info(runs)")]:
+            connection.execute("ALTER TABLE runs ADD COLUMN n_outliers INTEGER NOT NULL DEFAULT 0")
+        db = cls(connection, trajectories=TrajectoryStore(Path(filename).parent / "trajectories"))
+        if len(db) == 0 and csv is not None and Path(csv).exists():
+            db.import_csv(csv)
+        logger.info(f"Read {len(db)} runs!")
+        return db
+
+    def import_csv(self, filename: str) -> int:
+        """Insert the runs of a db.csv, runs already present are skipped. Returns the number of new runs."""
+        columns = read_columns(filename)
+        before = len(self)
+        rows = zip(
+            columns["id"].tolist(),
+            columns["session"].tolist(),
+            columns["time"].tolist(),
+            columns["name"].tolist(),
+            columns["circ_radius"].tolist(),
+            columns["circ_std"].tolist(),
+            (columns["circ_std"] / columns["circ_radius"]).tolist(),
+            columns["n_outliers"].tolist(),
+        )
+        with self.connection:
+            self.connection.execute("BEGIN")
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO runs (id, session, time, name, circ_radius, circ_std, ratio, n_outliers) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        return len(self) - before
+
+    def update_scores(self, ids: List[str], radii: np.ndarray, stds: np.ndarray, n_outliers: np.ndarray) -> None:
+        """Replace the scores of the runs ``ids`` in one transaction, see ``rescore_sqlite``."""
+        rows = zip(radii.tolist(), stds.tolist(), (stds / radii).tolist(), n_outliers.tolist(), ids)
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            self.connection.executemany(
+                "UPDATE runs SET circ_radius = ?, circ_std = ?, ratio = ?, n_outliers = ? WHERE id = ?", rows
+            )
+
+    def _where(self, condition: str = "", params: tuple = ()) -> Tuple[str, tuple]:
+        conditions = [condition] if condition else []
+        if self.session is not None:
+            conditions.append("session = ?")
+            params = params + (self.session,)
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+    def _column(self, column: str) -> list:
+        where, params = self._where()
+        return [
+            r[0] for r in self.connection.execute(f"SELECT {column} FROM runs{where} ORDER BY {self._order}", params)
+        ]
+
+    def __len__(self) -> int:
+        where, params = self._where()
+        return self.connection.execute(f"SELECT COUNT(*) FROM runs{where}", params).fetchone()[0]
+
+    @property
+    def runs(self) -> list[Run]:
+        """Materializes all runs, prefer the columns or ``get_run``."""
+        where, params = self._where()
+        return [
+            self._to_run(row)
+            for row in self.connection.execute(
+                f"SELECT session, id, time, name, circ_radius, circ_std, n_outliers FROM runs{where} ORDER BY {self._order}",
+                params,
+            )
+        ]
+
+    def _to_run(self, row: tuple) -> Run:
+        session, id, time, name, radius, std, n_outliers = row
+        run = Run(
+            session=session, id=id, time=time, name=name, circ_radius=radius, circ_std=std, n_outliers=n_outliers
+        )
+        coords = self.trajectories.get(session, id)
+        if coords is not None:
+            run.coords = coords
+        return run
+
+    @property
+    def sessions(self) -> list:
+        return self._column("session")
+
+    @property
+    def ids(self) -> list:
+        return self._column("id")
+
+    @property
+    def names(self) -> list:
+        return self._column("name")
+
+    @property
+    def times(self) -> list:
+        return self._column("time")
+
+    @property
+    def ratios(self) -> np.ndarray:
+        """
+        Returns ratios of standard deviation and radius
+        """
+        return np.array(self._column("ratio"), dtype=np.float64)
+
+    @property
+    def radii(self) -> np.ndarray:
+        return np.array(self._column("circ_radius"), dtype=np.float64)
+
+    @property
+    def stds(self) -> np.ndarray:
+        return np.array(self._column("circ_std"), dtype=np.float64)
+
+    def _read_data_version(self) -> int:
+        return self.connection.execute("PRAGMA data_version").fetchone()[0]
+
+    def refresh(self) -> int:
+        """
+        Every query reads the shared file, this only tells if other
+        connections changed it since the last call (1) or not (0).
+        """
+        data_version = self._read_data_version()
+        changed = data_version != self._data_version
+        self._data_version = data_version
+        return int(changed)
+
+    def leaderboard(self, *, n_max: int, ev_metric: EvaluationMetric) -> list[tuple[str, float]]:
+        column = METRIC_COLUMNS[ev_metric]
+        where, params = self._where()
+        return self.connection.execute(
+            f"SELECT name, {column} FROM runs{where} ORDER BY {column}, seq LIMIT ?", params + (n_max,)
+        ).fetchall()
+
+    def get_run(self, id: uuid.UUID) -> Run:
+        where, params = self._where("id = ?", (id,))
+        row = self.connection.execute(
+            f"SELECT session, id, time, name, circ_radius, circ_std, n_outliers FROM runs{where}", params
+        ).fetchone()
+        if row is None:
+            raise ValueError(f"{id} is not in the database")
+        return self._to_run(row)
+
+    def get_session(self, session: str) -> "SqliteDatabase":
+        return SqliteDatabase(self.connection, session=session, trajectories=self.trajectories)
+
+    def insert_run(self, run: Run) -> None:
+        try:
+            with self.connection:
+                self.connection.execute(
+                    "INSERT INTO runs (id, session, time, name, circ_radius, circ_std, ratio, n_outliers) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        run.id,
+                        run.session,
+                        run.time,
+                        run.name,
+                        run.circ_radius,
+                        run.circ_std,
+                        metric_value(run, EvaluationMetric.RATIO),
+                        run.n_outliers,
+                    ),
+                )
+        except Exception as e:
+            logger.error(f"Failed to save run: {e}")
+        if run.coords.ndim:
+            try:
+                self.trajectories.append(run.session, run.id, run.coords)
+            except Exception as e:
+                logger.error(f"Failed to save trajectory: {e}")
+
+    def del_run(self, id: uuid.UUID) -> None:
+        where, params = self._where("id = ?", (id,))
+        with self.connection:
+            self.connection.execute(f"DELETE FROM runs{where}", params)
+
+    def position(self, *, id: uuid.UUID, ev_metric: EvaluationMetric) -> int:
+        column = METRIC_COLUMNS[ev_metric]
+        where, params = self._where("id = ?", (id,))
+        row = self.connection.execute(f"SELECT {column}, seq FROM runs{where}", params).fetchone()
+        if row is None:
+            raise ValueError(f"{id} is not in the ranking")
+        value, seq = row
+        where, params = self._where(f"({column} < ? OR ({column} = ? AND seq < ?))", (value, value, seq))
+        return self.connection.execute(f"SELECT COUNT(*) FROM runs{where}", params).fetchone()[0] + 1
+
+    def session_position(self, *, session: str, id: uuid.UUID, ev_metric: EvaluationMetric) -> int:
+        return self.get_session(session).position(id=id, ev_metric=ev_metric)
+
+    def sort(self, ev_metric: EvaluationMetric = EvaluationMetric.STD) -> None:
+        self._order = f"{METRIC_COLUMNS[ev_metric]}, seq"
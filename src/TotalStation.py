@@ -1,6 +1,8 @@
 import logging
-from time import sleep
-from typing import Tuple
+import threading
+from collections import deque
+from time import perf_counter, sleep, time
+from typing import Optional, Sequence, Tuple
 
 import matplotlib.pyplot as plt
 import numpy as np
@@ -17,21 +19,179 @@ from src.pygeocom import (
     TMCMeasurementMode,
     lDirection,
 )
+from src.CircleFit import StreamingCircleFit
+from src.Observations import ObservationBuffer, polar_to_cartesian
+from src.RateController import RateController
+from src.RingBuffer import RingBuffer, RingBufferReader
 
 logger = logging.getLogger("root")
 
 
 class Connection:
-    def __init__(self, *, com: str, baud: int, tout: int) -> None:
+    def __init__(self, *, com: str, baud: int, tout: int, max_in_flight: int = 1) -> None:
         self.com = com
         self.baud = baud
         self.tout = tout
+        # requests kept in flight during acquisition, > 1 needs transaction id support
+        self.max_in_flight = max_in_flight
+
+
+class PollingTuner:
+    """
+    Keeps the wait time of get_full_measurement at the best rate of valid samples.
+
+    Started from the calibrated wait time (``reset``), it stays within a
+    factor ``band`` of it. The valid samples per second are counted over
+    windows of ``window`` replies. When more than ``high`` of a window's
+    replies lack a distance, the next wait time (a factor ``step`` away) is
+    tried for one window and kept only if it gave more valid samples per
+    second, otherwise the tuner goes back and tries the other direction next
+    time. Rare misses leave the wait time alone: a distance that arrives
+    early ends the wait anyway.
+    """
+
+    def __init__(
+        self,
+        wait_time: int = 300,
+        min_wait_time: int = 20,
+        max_wait_time: int = 1000,
+        band: float = 2.0,
+        window: int = 20,
+        high: float = 0.2,
+        step: float = 1.5,
+    ) -> None:
+        self.min_wait_time = min_wait_time
+        self.max_wait_time = max_wait_time
+        self.band = band
+        self.window = window
+        self.high = high
+        self.step = step
+        self.reset(wait_time)
+
+    def reset(self, wait_time: int) -> None:
+        """Start over from ``wait_time``, e.g. the calibrated one."""
+        self.wait_time = wait_time
+        self.lower = max(self.min_wait_time, int(wait_time / self.band))
+        self.upper = min(self.max_wait_time, int(wait_time * self.band))
+        self.rate = 0.0
+        self.miss_rate = 0.0
+        self._direction = 1
+        # (wait time, rate) before the wait time on trial
+        self._trial: Optional[Tuple[int, float]] = None
+        self._start_window()
+
+    def _start_window(self) -> None:
+        self._samples = 0
+        self._valid = 0
+        self._t0 = perf_counter()
+
+    def update(self, valid: bool) -> int:
+        self._samples += 1
+        self._valid += valid
+        if self._samples < self.window:
+            return self.wait_time
+
+        self.rate = self._valid / max(perf_counter() - self._t0, 1e-9)
+        self.miss_rate = 1 - self._valid / self._samples
+        wait_time = self.wait_time
+        if self._trial is not None:
+            previous, previous_rate = self._trial
+            self._trial = None
+            if self.rate < previous_rate:
+                wait_time = previous
+                self._direction = -self._direction
+        elif self.miss_rate > self.high:
+            factor = self.step if self._direction > 0 else 1 / self.step
+            candidate = min(self.upper, max(self.lower, int(self.wait_time * factor)))
+            if candidate == self.wait_time:
+                # at the edge of the band
+                self._direction = -self._direction
+            else:
+                self._trial = (self.wait_time, self.rate)
+                wait_time = candidate
+        if wait_time != self.wait_time:
+            logger.info(
+                f"{self.rate:.1f} valid samples/s, miss rate {self.miss_rate:.2f}: "
+                f"wait time {self.wait_time} -> {wait_time} ms"
+            )
+            self.wait_time = wait_time
+        self._start_window()
+        return self.wait_time
+
+
+class PollingCalibration:
+    """
+    Picks the send delay and wait time with the highest rate of valid samples.
+
+    Fed with the samples of a running acquisition, so no run waits for it.
+    Every candidate is kept for ``n`` samples: the send delays with the
+    initial wait time first, then the wait times with the best send delay.
+    After ``budget`` seconds the best setting probed so far is kept.
+    """
+
+    def __init__(
+        self,
+        wait_time: int,
+        send_delays: Sequence[int] = (0, 5, 20),
+        wait_times: Sequence[int] = (50, 100, 200, 300, 500),
+        n: int = 10,
+        budget: float = 5.0,
+    ) -> None:
+        self._stages = [("send_delay", d) for d in send_delays] + [("wait_time", w) for w in wait_times]
+        self.n = n
+        self.send_delay = send_delays[0]
+        self.wait_time = wait_time
+        self.finished = False
+        self._deadline = perf_counter() + budget
+        self._rates = {"send_delay": {}, "wait_time": {}}
+        self._stage = 0
+        self._samples = 0
+        self._valid = 0
+        self._t0 = perf_counter()
+
+    def record(self, valid: bool) -> bool:
+        """Count a sample of the current setting, returns True if the send delay changes."""
+        if self.finished:
+            return False
+        self._samples += 1
+        self._valid += valid
+        if self._samples < self.n and perf_counter() < self._deadline:
+            return False
+
+        kind, value = self._stages[self._stage]
+        if self._samples >= self.n:
+            rate = self._valid / (perf_counter() - self._t0)
+            self._rates[kind][value] = rate
+            logger.info(f"{kind.replace('_', ' ').capitalize()} {value:>4} ms: {rate:.1f} Hz")
+        send_delay = self.send_delay
+        self._stage += 1
+        self._samples = self._valid = 0
+        self._t0 = perf_counter()
+        if self._stage == len(self._stages) or perf_counter() >= self._deadline:
+            self.finished = True
+            self.send_delay = self._best("send_delay", self.send_delay)
+            self.wait_time = self._best("wait_time", self.wait_time)
+        else:
+            kind, value = self._stages[self._stage]
+            if kind == "send_delay":
+                self.send_delay = value
+            else:
+                self.send_delay = self._best("send_delay", self.send_delay)
+                self.wait_time = value
+        return self.send_delay != send_delay
+
+    def _best(self, kind: str, default: int) -> int:
+        rates = self._rates[kind]
+        return max(rates, key=rates.get) if rates else default
 
 
 class TotalStation:
-    def __init__(self, connection: Connection):
-        self.ser = serial.Serial(connection.com, connection.baud, timeout=int(connection.tout))
-        self.geo = PyGeoCom(self.ser, debug=False)
+    def __init__(self, connection: Connection, stream=None):
+        # stream: already opened serial-like object, e.g. a simulator (see src/GeoComSimulator.py)
+        if stream is None:
+            stream = serial.Serial(connection.com, connection.baud, timeout=int(connection.tout))
+        self.ser = stream
+        self.geo = PyGeoCom(self.ser, debug=False, max_in_flight=connection.max_in_flight)
         a, b, c = self.geo.get_software_version()
         logger.info(
             f"Connection Settings - Port: {connection.com}, Baudrate: {connection.baud}, Timeout: {connection.tout}"
@@ -42,16 +202,42 @@ class TotalStation:
         self.connected = True
         self.no_dist_cnt = 0
 
+        # wait time of get_full_measurement and send delay, calibrated during the first acquisition
+        self.tuner = PollingTuner()
+        self.send_delay = 0
+        self.calibrated = False
+
+        # raw observations of the run and the accepted points
+        self.observations = ObservationBuffer()
         self.x_vals = []
         self.y_vals = []
+        # circle through the accepted points, updated with every point
+        self.fit = StreamingCircleFit()
+
+        self.samples: Optional[RingBuffer] = None
+        self.acquisition_rate = RateController()
+        self._acquiring = threading.Event()
+        self._acquisition: Optional[threading.Thread] = None
 
     def clear_points(self):
+        self.observations.clear()
         self.x_vals = []
         self.y_vals = []
+        self.fit.clear()
 
     def add_point(self):
-        x_i, y_i = self.measure_single_point()
+        observation = self.measure_observation()
+        if observation is not None:
+            self.add_observations([observation])
+
+    def add_observations(self, observations: list) -> int:
+        """Store raw observations and accept their points, returns the number of accepted points."""
+        if not observations:
+            return 0
+        x, y = polar_to_cartesian(self.observations.extend(observations))
+        return sum(self.accept_point(x_i, y_i) for x_i, y_i in zip(x.tolist(), y.tolist()))
 
+    def accept_point(self, x_i: float, y_i: float) -> bool:
         # if measurement is present
         m_present = x_i != 0 and y_i != 0
 
@@ -64,8 +250,83 @@ class TotalStation:
         if m_present and mov:
             self.x_vals.append(x_i)
             self.y_vals.append(y_i)
+            self.fit.add(x_i, y_i)
+            return True
+        return False
+
+    def start_acquisition(self, capacity: int = 4096, rate: Optional[float] = None) -> RingBufferReader:
+        """
+        Poll raw observations on a background thread into the ring buffer ``samples``.
+
+        ``rate`` is the target sample rate [Hz], None polls as fast as the link
+        allows; ``acquisition_rate`` reports the achieved rate. Returns a reader
+        for the samples, further consumers can call ``samples.reader()``. No
+        other requests must be sent until ``stop_acquisition``.
+        """
+        self.stop_acquisition()
+        self.samples = RingBuffer(capacity)
+        self.acquisition_rate = RateController(rate)
+        reader = self.samples.reader()
+        self._acquiring.set()
+        self._acquisition = threading.Thread(target=self._acquire, name="acquisition", daemon=True)
+        self._acquisition.start()
+        logger.info("Leica RTS: started acquisition!")
+        return reader
+
+    def stop_acquisition(self) -> None:
+        if self._acquisition is None:
+            return
+        self._acquiring.clear()
+        self._acquisition.join()
+        self._acquisition = None
+        logger.info(f"Leica RTS: stopped acquisition! Sample rate: {self.acquisition_rate.report()}")
+
+    def collect_points(self, reader: RingBufferReader) -> int:
+        """Move new observations of the acquisition into the run, returns the number of accepted points."""
+        return self.add_observations(reader.read())
+
+    def _acquire(self) -> None:
+        # the first acquisition also calibrates the polling, on the samples of the run
+        calibration = None
+        if not self.calibrated:
+            logger.info("Leica RTS: calibrating polling...")
+            calibration = PollingCalibration(self.tuner.wait_time)
+            self._set_send_delay(calibration.send_delay)
+
+        # keep up to max_in_flight requests on the link, so the instrument never waits for us
+        pending = deque()
+        while self._acquiring.is_set():
+            wait_time = calibration.wait_time if calibration is not None else self.tuner.wait_time
+            try:
+                while len(pending) < self.geo.max_in_flight:
+                    pending.append(self.geo.submit_full_measurement(TMCInclinationMode.AUTOMATIC, wait_time))
+                measurement = pending.popleft().result()
+            except Exception as e:
+                logger.error(e)
+                measurement = None
+                self._tune(False)
+            if measurement is not None:
+                self.samples.append((time(),) + measurement)
+                try:
+                    self.check_measurement(measurement)
+                except Exception as e:
+                    logger.error(e)
+            if calibration is not None:
+                if calibration.record(measurement is not None and measurement[3] != 0):
+                    self._set_send_delay(calibration.send_delay)
+                if calibration.finished:
+                    self._calibrated(calibration)
+                    calibration = None
+            self.acquisition_rate.tick()
+
+        # collect the replies still on the link
+        for p in pending:
+            try:
+                p.result()
+            except Exception:
+                pass
 
-    def kinematic_animation(self):
+    def kinematic_animation(self, info: str = ""):
         plt.cla()
         plt.xlabel("x [m]")
         plt.ylabel("y [m]")
@@ -73,18 +334,25 @@ class TotalStation:
         if len(self.x_vals) < 5:
             plt.title("Durchlauf gestartet!\nViel Erfolg!", fontsize=50)
         plt.plot(self.x_vals, self.y_vals, ".-", linewidth=4, markersize=20)
+        if info:
+            plt.text(0.01, 0.01, info, fontsize=12, color="gray", transform=plt.gca().transAxes)
         plt.axis("off")
-        plt.pause(0.05)
+        # only process GUI events, the caller paces the rendering
+        plt.pause(0.001)
 
     def start_tracking(self, attempts: int = 3, manual: bool = False) -> bool:
         n = 1
         while n <= attempts:
             try:
                 # prepare tracking
-                self.geo.set_prism_type(PrismType.LEICA_360)
-                self.geo.set_user_atr_state(OnOff.ON)
-                self.geo.set_fine_adjust_mode(FineAdjustPositionMode.POINT)
-                self.geo.set_user_lock_state(OnOff.ON)
+                (
+                    self.geo.batch()
+                    .set_prism_type(PrismType.LEICA_360)
+                    .set_user_atr_state(OnOff.ON)
+                    .set_fine_adjust_mode(FineAdjustPositionMode.POINT)
+                    .set_user_lock_state(OnOff.ON)
+                    .execute()
+                )
 
                 logger.info("Leica RTS: searching for target...")
                 if manual:
@@ -96,10 +364,11 @@ class TotalStation:
                 logger.info("Leica RTS: locked into prism!")
 
                 # kinematic continuous measurement mode
-                self.geo.set_edm_mode(EDMMeasurementMode.CONTINUOUS_FAST)
-                self.geo.do_measure(
-                    TMCMeasurementMode.DISTANCE_RAPID_TRACKING,
-                    TMCInclinationMode.AUTOMATIC,
+                (
+                    self.geo.batch()
+                    .set_edm_mode(EDMMeasurementMode.CONTINUOUS_FAST)
+                    .do_measure(TMCMeasurementMode.DISTANCE_RAPID_TRACKING, TMCInclinationMode.AUTOMATIC)
+                    .execute()
                 )
                 logger.info("Leica RTS: switched to tracking mode!")
                 return True
@@ -109,9 +378,13 @@ class TotalStation:
         return False
 
     def power_search(self):
-        self.geo.set_search_area(0, 1.5708, 6.283, 0.6, 1)
-        self.geo.ps_set_range(1, 20)
-        self.geo.ps_enable_range(BOOLE.TRUE)
+        (
+            self.geo.batch()
+            .set_search_area(0, 1.5708, 6.283, 0.6, 1)
+            .ps_set_range(1, 20)
+            .ps_enable_range(BOOLE.TRUE)
+            .execute()
+        )
         logger.info("Leica RTS: searching for target...")
         logger.info(f"Leica RTS: Search window: {self.geo.get_search_area()}")
         self.geo.ps_search_window()
@@ -127,12 +400,17 @@ class TotalStation:
         logger.info("Leica RTS: locked into prism!")
 
     def stop_tracking(self):
+        self.stop_acquisition()
         try:
-            self.geo.set_user_lock_state(OnOff.OFF)
-            self.geo.set_edm_mode(EDMMeasurementMode.SINGLE_STANDARD)
-            self.geo.do_measure(TMCMeasurementMode.STOP_AND_CLEAR, TMCInclinationMode.AUTOMATIC)
-            self.geo.set_egl_intensity(OnOff.OFF)
-            self.geo.user_lock_state_off()
+            (
+                self.geo.batch()
+                .set_user_lock_state(OnOff.OFF)
+                .set_edm_mode(EDMMeasurementMode.SINGLE_STANDARD)
+                .do_measure(TMCMeasurementMode.STOP_AND_CLEAR, TMCInclinationMode.AUTOMATIC)
+                .set_egl_intensity(OnOff.OFF)
+                .user_lock_state_off()
+                .execute()
+            )
             # always start with face 0
             if self.geo.get_face() == 1:
                 self.geo.change_face()
@@ -159,32 +437,81 @@ class TotalStation:
             TMCInclinationMode.AUTOMATIC,
         )
 
-    def measure_single_point(self) -> Tuple[float, float]:
+    def measure_observation(self) -> Optional[tuple]:
+        """One raw observation (see ``OBSERVATION_DTYPE``), None if the measurement failed."""
         # try measuring
         try:
-            (
-                _,
-                hz,
-                v,
-                slope_distance,
-                _,
-                _,
-                _,
-            ) = self.geo.get_full_measurement(TMCInclinationMode.AUTOMATIC, 300)
-            x = slope_distance * np.sin(hz) * np.sin(v)
-            y = slope_distance * np.cos(hz) * np.sin(v)
-
-            if slope_distance == 0:
-                self.no_dist_cnt += 1
-                logger.warning(f"No distance measurement available! ({self.no_dist_cnt})")
-                if self.no_dist_cnt > 10:
-                    logger.info("Restarting distance measurement!")
-                    self.restart_distance()
-                    self.no_dist_cnt = 0
-            else:
-                self.no_dist_cnt = 0
-
-            return x, y
+            measurement = self.geo.get_full_measurement(TMCInclinationMode.AUTOMATIC, self.tuner.wait_time)
+        except Exception as e:
+            logger.error(e)
+            self._tune(False)
+            return None
+        observation = (time(),) + measurement
+        try:
+            self.check_measurement(measurement)
         except Exception as e:
             logger.error(e)
+        return observation
+
+    def measure_single_point(self) -> Tuple[float, float]:
+        observation = self.measure_observation()
+        if observation is None:
             return (0, 0)
+        _, _, hz, v, slope_distance, _, _, _ = observation
+        x = slope_distance * np.sin(hz) * np.sin(v)
+        y = slope_distance * np.cos(hz) * np.sin(v)
+        return x, y
+
+    def check_measurement(self, measurement: tuple) -> None:
+        slope_distance = measurement[3]
+        self._tune(slope_distance != 0)
+
+        if slope_distance == 0:
+            self.no_dist_cnt += 1
+            logger.warning(f"No distance measurement available! ({self.no_dist_cnt})")
+            if self.no_dist_cnt > 10:
+                logger.info("Restarting distance measurement!")
+                self.restart_distance()
+                self.no_dist_cnt = 0
+        else:
+            self.no_dist_cnt = 0
+
+    def _set_send_delay(self, send_delay: int) -> None:
+        try:
+            self.geo.set_send_delay(send_delay)
+        except Exception as e:
+            logger.warning(f"Failed to set send delay {send_delay} ms: {e}")
+
+    def _tune(self, valid: bool) -> None:
+        # the tuner only starts from the calibrated wait time, it would fight the calibration
+        if self.calibrated:
+            self.tuner.update(valid)
+
+    def _calibrated(self, calibration: PollingCalibration) -> None:
+        self.send_delay = calibration.send_delay
+        self.tuner.reset(calibration.wait_time)
+        self.calibrated = True
+        logger.info(f"Leica RTS: send delay {self.send_delay} ms, wait time {self.tuner.wait_time} ms")
+
+    def calibrate(self, n: int = 10, budget: float = 5.0) -> Tuple[int, int]:
+        """
+        Calibrate the polling right away instead of during the first acquisition.
+
+        Needs the instrument to be locked and in tracking mode, takes at most
+        ``budget`` seconds (see ``PollingCalibration``). Returns (send delay
+        [ms], wait time [ms]).
+        """
+        logger.info("Leica RTS: calibrating polling...")
+        calibration = PollingCalibration(self.tuner.wait_time, n=n, budget=budget)
+        self._set_send_delay(calibration.send_delay)
+        while not calibration.finished:
+            try:
+                measurement = self.geo.get_full_measurement(TMCInclinationMode.AUTOMATIC, calibration.wait_time)
+                valid = measurement[3] != 0
+            except Exception as e:
+                logger.debug(f"Probe failed: {e}")
+                valid = False
+            if calibration.record(valid):
+                self._set_send_delay(calibration.send_delay)
+        self._calibrated(calibration)
+        return self.send_delay, self.tuner.wait_time
@@ -0,0 +1,97 @@
+import re
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+
+from src.FileLock import FileLock
+
+# one point of a trajectory, local coords relative to the circle centre [m]
+POINT_DTYPE = np.dtype(("<f8", (2,)))
+
+
+class TrajectoryStore:
+    """
+    Append-only binary store of run trajectories, one pair of files per session.
+
+    ``<session>.bin`` holds the coords of all runs of the session back to
+    back, ``<session>.idx`` one line ``id,offset,n`` per run (offset and n in
+    points). Trajectories are read through a memory map, so only the pages
+    of the requested runs are loaded. Appends are locked between processes,
+    runs other processes stored are found by reading the index again from
+    where it was read last.
+    """
+
+    def __init__(self, directory: Union[str, Path] = "./db/trajectories") -> None:
+        self.directory = Path(directory)
+        # session -> id -> (offset, n), read on first access of a session
+        self._index: Dict[str, Dict[str, Tuple[int, int]]] = {}
+        # session -> bytes of the .idx file read so far
+        self._index_end: Dict[str, int] = {}
+        self._maps: Dict[str, np.memmap] = {}
+        # between processes appending to the same session, see src/FileLock.py
+        self.file_lock = FileLock(self.directory / ".lock")
+
+    def _path(self, session: str, suffix: str) -> Path:
+        return self.directory / (re.sub(r"[^\w\-. ]", "_", session) + suffix)
+
+    def _read_index(self, session: str) -> Dict[str, Tuple[int, int]]:
+        """Index of the session, with the lines appended since the last read."""
+        index = self._index.setdefault(session, {})
+        end = self._index_end.get(session, 0)
+        try:
+            with open(self._path(session, ".idx"), "rb") as f:
+                f.seek(end)
+                data = f.read()
+        except FileNotFoundError:
+            return index
+        # a line still being written is read next time
+        data = data[: data.rfind(b"\n") + 1]
+        for l in data.decode().splitlines():
+            id, offset, n = l.split(",")
+            index[id] = (int(offset), int(n))
+        self._index_end[session] = end + len(data)
+        return index
+
+    def _entry(self, session: str, id: str) -> Optional[Tuple[int, int]]:
+        index = self._index.get(session)
+        entry = index.get(id) if index is not None else None
+        if entry is None:
+            # not read yet, or stored by another process since
+            entry = self._read_index(session).get(id)
+        return entry
+
+    def _map(self, session: str, n_points: int) -> np.memmap:
+        """Map of the session's points, mapped again if it does not reach ``n_points`` yet."""
+        mm = self._maps.get(session)
+        if mm is None or len(mm) < n_points:
+            mm = np.memmap(self._path(session, ".bin"), dtype=np.float64, mode="r").reshape(-1, 2)
+            self._maps[session] = mm
+        return mm
+
+    def __contains__(self, key: Tuple[str, str]) -> bool:
+        session, id = key
+        return self._entry(session, id) is not None
+
+    def get(self, session: str, id: str) -> Optional[np.ndarray]:
+        """Read-only (n, 2) view of the trajectory, None if it was not stored."""
+        entry = self._entry(session, id)
+        if entry is None:
+            return None
+        offset, n = entry
+        return self._map(session, offset + n)[offset : offset + n]
+
+    def append(self, session: str, id: str, coords: np.ndarray) -> None:
+        coords = np.ascontiguousarray(coords, dtype=POINT_DTYPE.base).reshape(-1, 2)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        # the offset is only valid until another process appends
+        with self.file_lock:
+            # data first, an index entry only ever points to written points
+            with open(self._path(session, ".bin"), "ab") as f:
+                offset = f.tell() // POINT_DTYPE.itemsize
+                f.write(coords.tobytes())
+            with open(self._path(session, ".idx"), "a") as f:
+                f.write(f"{id},{offset},{len(coords)}\n")
+
+        self._index.setdefault(session, {})[id] = (offset, len(coords))
@@ -1,8 +1,12 @@
-from typing import Tuple, Any, Callable
+import json
+import logging
+import math
+from typing import Tuple, Any, Callable, Deque, Dict, List, Optional
 from enum import Enum, IntFlag
 from datetime import datetime
-from collections import namedtuple
-from time import time
+from collections import Counter, deque, namedtuple
+from threading import RLock
+from time import perf_counter
 
 GRC_TPS = 0x0000  # main return codes (identical to RC_SUP!!)
 GRC_SUP = 0x0000  # supervisor task (identical to RCBETA!!)
@@ -49,6 +53,8 @@ GRC_PTF = 0x4F00  # reserved for new GPS1200 subsystem
 GRC_APP = 0x5000  # offset for all applications
 GRC_RES = 0x7000  # reserved code range
 
+logger = logging.getLogger("root")
+
 
 class ReturnCode(Enum):
     GRC_OK = GRC_TPS + 0  # Function successfully completed.
@@ -568,70 +574,461 @@ def noop_return_code_handler(return_code: int):
     return
 
 
+# transaction ids of the ASCII protocol wrap around after 7
+MAX_TRANSACTION_ID = 7
+
+
+def encode_argument(arg) -> str:
+    if type(arg) == str:
+        return '"{}"'.format(arg)
+    elif type(arg) == int:
+        return "{}".format(arg)
+    elif type(arg) == float:
+        return "{}".format(arg)
+    elif type(arg) == bool:
+        return "1" if arg == True else "0"
+    elif type(arg) == byte:
+        return "'{:02X}'".format(arg)
+
+
+def encode_request(
+    rpc_id: int, args: Tuple[Any, ...] = (), transaction_id: Optional[int] = None
+) -> bytes:
+    if transaction_id is None:
+        header = "%R1Q,{}".format(rpc_id)
+    else:
+        header = "%R1Q,{},{}".format(rpc_id, transaction_id)
+    return "\n{}:{}\r\n".format(
+        header, ",".join([encode_argument(a) for a in args])
+    ).encode("ascii")
+
+
+def parse_reply(d: bytes) -> Tuple[int, int, ReturnCode, Tuple[bytes, ...]]:
+    geocom_return_code, transaction_id, parameters = parse_reply_header(d)
+    rpc_return_code, *p = parameters.rstrip().split(b",")
+    rpc_return_code = ReturnCode(int(rpc_return_code))
+
+    return geocom_return_code, transaction_id, rpc_return_code, tuple(p)
+
+
+def parse_reply_header(d: bytes) -> Tuple[int, int, bytes]:
+    """Split a reply frame into GeoCOM return code, transaction id and the
+    still encoded parameters (starting with the RPC return code)."""
+    header, _, parameters = d.partition(b":")
+    reply_type, _, header = header.partition(b",")
+    if not reply_type.endswith(b"%R1P"):
+        raise ValueError(f"Not a GeoCOM reply: {d!r}")
+    geocom_return_code, _, transaction_id = header.partition(b",")
+    transaction_id = int(transaction_id) if transaction_id else 0
+    return int(geocom_return_code), transaction_id, parameters
+
+
+# ReturnCode(...) goes through the Enum machinery on every call, a dict doesn't
+RETURN_CODES: Dict[int, ReturnCode] = {rc.value: rc for rc in ReturnCode}
+
+
+def decode_parameters(
+    geocom_return_code: int,
+    parameters: bytes,
+    return_code_handler: Callable[[int], None],
+    decoder: Optional[Callable[[List[bytes]], Any]] = None,
+) -> Any:
+    """Decode the parameters of a reply.
+
+    Without ``decoder`` the reply is returned like ``PyGeoCom._request`` always
+    did: ``(geocom_return_code, rpc_return_code, *parameters)`` with the
+    parameters still encoded. With a decoder from ``REPLY_DECODERS`` only the
+    typed fields are returned.
+    """
+    if decoder is not None:
+        # int() and float() skip the trailing line break themselves
+        p = parameters.split(b",")
+    else:
+        p = parameters.rstrip().split(b",")
+    rpc_return_code = RETURN_CODES.get(int(p[0]))
+    if rpc_return_code is None:
+        raise ValueError(f"{p[0]!r} is not a valid ReturnCode")
+    return_code_handler(rpc_return_code)
+
+    if decoder is not None:
+        return decoder(p)
+    return (geocom_return_code, rpc_return_code) + tuple(p[1:])
+
+
+def compile_decoder(
+    *fields: Tuple[int, Callable[[bytes], Any]]
+) -> Callable[[List[bytes]], Tuple[Any, ...]]:
+    """Build a decoder for the split reply parameters.
+
+    ``fields`` are ``(index, converter)`` pairs in output order, index 0 is
+    the RPC return code. A reply with too few parameters raises ValueError
+    like any other malformed reply. The last parameter still carries the line
+    break, converters must ignore it like int/float do.
+    """
+    converters = tuple(fields)
+    n_fields = max(index for index, _ in fields) + 1
+
+    def decode(p: List[bytes]) -> Tuple[Any, ...]:
+        if len(p) < n_fields:
+            raise ValueError(f"Expected {n_fields} reply parameters, got {len(p)}: {p!r}")
+        return tuple([converter(p[index]) for index, converter in converters])
+
+    return decode
+
+
+# typed reply fields of the RPCs on the measurement and status paths
+REPLY_FIELDS: Dict[int, Tuple[Tuple[int, Callable[[bytes], Any]], ...]] = {
+    # instrument number
+    5003: ((1, int),),
+    # release, version, subversion
+    5034: ((1, int), (2, int), (3, int)),
+    110: ((1, int), (2, int), (3, int)),
+    # memory voltage, internal temperature
+    5010: ((1, float),),
+    5011: ((1, float),),
+    # signal intensity, time
+    2022: ((1, float), (2, int)),
+    # face
+    2026: ((1, int),),
+    # motor lock status
+    6021: ((1, int),),
+    # hz, v
+    2107: ((1, float), (2, float)),
+    # hz, v, slope distance
+    2108: ((1, float), (2, float), (3, float)),
+    # e, n, h, measure time, e_cont, n_cont, h_cont, measure time cont
+    2082: (
+        (1, float),
+        (2, float),
+        (3, float),
+        (4, int),
+        (5, float),
+        (6, float),
+        (7, float),
+        (8, int),
+    ),
+    # reply: hz, v, acc. angle, cross incl., length incl., acc. incl., slope
+    # distance, measure time; decoded to the get_full_measurement tuple
+    2167: (
+        (8, int),
+        (1, float),
+        (2, float),
+        (7, float),
+        (6, float),
+        (4, float),
+        (5, float),
+    ),
+}
+
+REPLY_DECODERS: Dict[int, Callable[[List[bytes]], Tuple[Any, ...]]] = {
+    rpc_id: compile_decoder(*fields) for rpc_id, fields in REPLY_FIELDS.items()
+}
+
+
+def nearest_rank(values: List[float], q: float) -> Optional[float]:
+    """Percentile ``q`` (0..100) of already sorted ``values``."""
+    if not values:
+        return None
+    return values[max(0, math.ceil(q / 100 * len(values)) - 1)]
+
+
+class RpcStatistics:
+    """Statistics of a single RPC, latencies are kept for the last ``history`` calls."""
+
+    def __init__(self, history: int = 1000):
+        self.calls = 0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.timeouts = 0
+        self.latencies: Deque[float] = deque(maxlen=history)
+        self.return_codes: Counter = Counter()
+
+    def record(self, request_len: int, reply_len: int, latency: float, return_code: int):
+        self.calls += 1
+        self.bytes_out += request_len
+        self.bytes_in += reply_len
+        self.latencies.append(latency)
+        if return_code != ReturnCode.GRC_OK.value:
+            self.return_codes[return_code] += 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Latency [s] at percentile ``q`` (0..100) of the recorded history."""
+        return nearest_rank(sorted(self.latencies), q)
+
+    def summary(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+
+        def rank(q: float) -> Optional[float]:
+            latency = nearest_rank(latencies, q)
+            return latency * 1000 if latency is not None else None
+
+        return {
+            "calls": self.calls,
+            "timeouts": self.timeouts,
+            "bytes_out": self.bytes_out,
+            "bytes_in": self.bytes_in,
+            "latency_ms": {
+                "p50": rank(50),
+                "p95": rank(95),
+                "p99": rank(99),
+                "max": rank(100),
+            },
+            "return_codes": {
+                RETURN_CODES[rc].name if rc in RETURN_CODES else str(rc): count
+                for rc, count in self.return_codes.items()
+            },
+        }
+
+
+class GeoComStatistics:
+    """Per RPC id statistics of a GeoCOM connection."""
+
+    def __init__(self, history: int = 1000):
+        self.history = history
+        self.rpcs: Dict[int, RpcStatistics] = {}
+
+    def __getitem__(self, rpc_id: int) -> RpcStatistics:
+        stats = self.rpcs.get(rpc_id)
+        if stats is None:
+            stats = self.rpcs[rpc_id] = RpcStatistics(self.history)
+        return stats
+
+    def record(
+        self,
+        rpc_id: int,
+        request_len: int,
+        reply_len: int,
+        latency: float,
+        return_code: int,
+    ):
+        self[rpc_id].record(request_len, reply_len, latency, return_code)
+
+    def record_timeout(self, rpc_id: int, request_len: int):
+        stats = self[rpc_id]
+        stats.timeouts += 1
+        stats.bytes_out += request_len
+
+    def reset(self):
+        self.rpcs = {}
+
+    def summary(self) -> Dict[int, Dict[str, Any]]:
+        return {rpc_id: self.rpcs[rpc_id].summary() for rpc_id in sorted(self.rpcs)}
+
+    def dump_json(self, filename: str):
+        with open(filename, "w") as f:
+            json.dump(
+                {str(rpc_id): s for rpc_id, s in self.summary().items()}, f, indent=2
+            )
+
+    def log_summary(self):
+        for rpc_id, s in self.summary().items():
+            latency = s["latency_ms"]
+            logger.info(
+                f"RPC {rpc_id:>5}: {s['calls']:>6} calls, {s['timeouts']} timeouts, "
+                f"p50 {latency['p50'] or 0:.1f} ms, p95 {latency['p95'] or 0:.1f} ms, "
+                f"max {latency['max'] or 0:.1f} ms, errors {s['return_codes']}"
+            )
+
+
+class PendingReply:
+    """Reply to a request that has already been written to the instrument.
+
+    ``result()`` blocks until the reply with the matching transaction id has
+    been read, applies the return code handler and returns the decoded reply.
+    """
+
+    def __init__(
+        self,
+        geocom: "PyGeoCom",
+        rpc_id: int,
+        transaction_id: int,
+        return_code_handler: Callable[[int], None],
+        decoder: Optional[Callable[[List[bytes]], Any]] = None,
+        request_len: int = 0,
+    ):
+        self.rpc_id = rpc_id
+        self.transaction_id = transaction_id
+        self.request_len = request_len
+        self.sent_time = perf_counter()
+        self._geocom = geocom
+        self._return_code_handler = return_code_handler
+        self._decoder = decoder
+        self._reply = None
+        # set if the request was given up while waiting for a free slot
+        self._error: Optional[Exception] = None
+
+    def done(self) -> bool:
+        return self._reply is not None or self._error is not None
+
+    def result(self) -> Any:
+        if not self.done():
+            self._geocom._wait_for(self)
+        if self._error is not None:
+            raise self._error
+
+        geocom_return_code, parameters = self._reply
+        return decode_parameters(
+            geocom_return_code, parameters, self._return_code_handler, self._decoder
+        )
+
+
 class PyGeoCom:
-    def __init__(self, stream, debug: bool = False):
+    def __init__(
+        self,
+        stream,
+        debug: bool = False,
+        max_in_flight: int = 1,
+        statistics_history: int = 1000,
+    ):
+        """
+        With ``max_in_flight > 1`` requests carry transaction ids and up to
+        ``max_in_flight`` of them may be outstanding on the link at once,
+        see ``submit``. The default sends one request at a time without
+        transaction id, like instruments expect it out of the box.
+
+        ``statistics`` collects calls, bytes, latencies and error codes per
+        RPC, keeping the latencies of the last ``statistics_history`` calls.
+        """
+        if max_in_flight < 1 or max_in_flight > MAX_TRANSACTION_ID + 1:
+            raise ValueError(
+                f"max_in_flight must be between 1 and {MAX_TRANSACTION_ID + 1}"
+            )
         self._stream = stream
         self._stream.write(b"\n")
         self._debug = debug
-        self.req_len = []
-        self.req_time = []
-        self.resp_len = []
-        self.resp_time = []
+        self.max_in_flight = max_in_flight
+        self._transaction_id = 0
+        self._pending: Dict[int, PendingReply] = {}
+        self._lock = RLock()
+        self.statistics = GeoComStatistics(statistics_history)
+
+    @property
+    def pipelined(self) -> bool:
+        return self.max_in_flight > 1
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._pending)
+
+    def _next_transaction_id(self) -> int:
+        while True:
+            self._transaction_id = (self._transaction_id + 1) % (
+                MAX_TRANSACTION_ID + 1
+            )
+            if self._transaction_id not in self._pending:
+                return self._transaction_id
+
+    def _read_reply(self) -> None:
+        d = self._stream.readline()
+        resp_time = perf_counter()
+        if self._debug:
+            print(b"<< " + d)
+        if not d:
+            raise TimeoutError("No reply from instrument")
+
+        geocom_return_code, transaction_id, parameters = parse_reply_header(d)
+
+        if self.pipelined:
+            pending = self._pending.pop(transaction_id, None)
+            if pending is None:
+                # reply to a request we already gave up on
+                logger.warning(
+                    f"Dropping reply with unknown transaction id {transaction_id}"
+                )
+                return
+        else:
+            _, pending = self._pending.popitem()
+        pending._reply = (geocom_return_code, parameters)
+
+        rpc_return_code = parameters.partition(b",")[0]
+        self.statistics.record(
+            pending.rpc_id,
+            pending.request_len,
+            len(d),
+            resp_time - pending.sent_time,
+            int(rpc_return_code) if rpc_return_code.strip().isdigit() else -1,
+        )
 
-    def _request(
+    def _wait_for(self, pending: PendingReply) -> None:
+        with self._lock:
+            try:
+                while not pending.done():
+                    self._read_reply()
+            except Exception as e:
+                if self._pending.get(pending.transaction_id) is pending:
+                    del self._pending[pending.transaction_id]
+                if isinstance(e, TimeoutError):
+                    self.statistics.record_timeout(pending.rpc_id, pending.request_len)
+                raise
+
+    def submit(
         self,
         rpc_id: int,
         args: Tuple[Any, ...] = (),
         return_code_handler: Callable[[int], None] = default_return_code_handler,
-    ) -> Tuple[Any, ...]:
-        def encode(arg) -> str:
-            if type(arg) == str:
-                return '"{}"'.format(arg)
-            elif type(arg) == int:
-                return "{}".format(arg)
-            elif type(arg) == float:
-                return "{}".format(arg)
-            elif type(arg) == bool:
-                return "1" if arg == True else "0"
-            elif type(arg) == byte:
-                return "'{:02X}'".format(arg)
-
-        d = "\n%R1Q,{}:{}\r\n".format(
-            rpc_id, ",".join([encode(a) for a in args])
-        ).encode("ascii")
-        if self._debug:
-            print(b">> " + d)
-        self.req_len = len(d)
-        self.req_time = time()
-        self._stream.write(d)
+        decoder: Optional[Callable[[List[bytes]], Any]] = None,
+    ) -> PendingReply:
+        """Send a request without waiting for its reply.
 
-        d = self._stream.readline()
-        self.resp_time = time()
-        self.resp_len = len(d)
-        if self._debug:
-            print(b"<< " + d)
-        header, parameters = d.split(b":", 1)
-
-        reply_type, geocom_return_code, transaction_id = header.split(b",")
-        assert reply_type == b"%R1P"
-        geocom_return_code = int(geocom_return_code)
-        transaction_id = int(transaction_id)
+        If ``max_in_flight`` requests are already outstanding, replies are read
+        (and handed to their callers) until a slot is free. See
+        ``decode_parameters`` for ``decoder``.
+        """
+        with self._lock:
+            while len(self._pending) >= self.max_in_flight:
+                try:
+                    self._read_reply()
+                except TimeoutError as e:
+                    # give up the oldest request, its caller gets the error from result()
+                    transaction_id, overdue = min(
+                        self._pending.items(), key=lambda item: item[1].sent_time
+                    )
+                    del self._pending[transaction_id]
+                    overdue._error = e
+                    self.statistics.record_timeout(overdue.rpc_id, overdue.request_len)
+
+            if self.pipelined:
+                transaction_id = self._next_transaction_id()
+                d = encode_request(rpc_id, args, transaction_id)
+            else:
+                transaction_id = 0
+                d = encode_request(rpc_id, args)
+            if self._debug:
+                print(b">> " + d)
+            # stamped before the write, the latency includes sending the request
+            pending = PendingReply(
+                self, rpc_id, transaction_id, return_code_handler, decoder, len(d)
+            )
+            self._stream.write(d)
+            self._pending[transaction_id] = pending
+            return pending
 
-        parameters = parameters.rstrip()
-        rpc_return_code, *p = parameters.split(b",")
-        rpc_return_code = ReturnCode(int(rpc_return_code))
+    def _request(
+        self,
+        rpc_id: int,
+        args: Tuple[Any, ...] = (),
+        return_code_handler: Callable[[int], None] = default_return_code_handler,
+    ) -> Tuple[Any, ...]:
+        return self.submit(rpc_id, args, return_code_handler).result()
 
-        return_code_handler(rpc_return_code)
+    def _request_fields(
+        self,
+        rpc_id: int,
+        args: Tuple[Any, ...] = (),
+        return_code_handler: Callable[[int], None] = default_return_code_handler,
+    ) -> Tuple[Any, ...]:
+        """Like ``_request``, but returns the typed fields of ``REPLY_FIELDS``."""
+        return self.submit(
+            rpc_id, args, return_code_handler, REPLY_DECODERS[rpc_id]
+        ).result()
 
-        return (geocom_return_code, rpc_return_code) + tuple(p)
+    def batch(self, max_in_flight: int = MAX_TRANSACTION_ID + 1) -> "CommandBatch":
+        """Collect setter calls and send them back-to-back, see ``CommandBatch``."""
+        return CommandBatch(self, max_in_flight)
 
     def get_instrument_number(self) -> int:
-        (
-            _,
-            _,
-            instrument_number,
-        ) = self._request(5003)
-        return int(instrument_number)
+        (instrument_number,) = self._request_fields(5003)
+        return instrument_number
 
     def get_instrument_name(self) -> str:
         _, _, instrument_name = self._request(5004)
@@ -665,8 +1062,7 @@ class PyGeoCom:
         )
 
     def get_software_version(self) -> Tuple[int, int, int]:
-        _, _, release, version, subversion = self._request(5034)
-        return int(release), int(version), int(subversion)
+        return self._request_fields(5034)
 
     def check_power(self) -> Tuple[int, PowerPath, PowerPath]:
         _, _, capacity, active_power, power_suggest = self._request(5039)
@@ -677,12 +1073,12 @@ class PyGeoCom:
         )
 
     def get_memory_voltage(self) -> float:
-        _, _, memory_voltage = self._request(5010)
-        return float(memory_voltage)
+        (memory_voltage,) = self._request_fields(5010)
+        return memory_voltage
 
     def get_internal_temperature(self) -> float:
-        _, _, internal_temperature = self._request(5011)
-        return float(internal_temperature)
+        (internal_temperature,) = self._request_fields(5011)
+        return internal_temperature
 
     def get_up_counter(self) -> Tuple[int, int]:
         _, _, power_on, wake_up = self._request(12003)
@@ -745,12 +1141,8 @@ class PyGeoCom:
         self._request(1059, (intensity.value,))
 
     def get_motor_lock_status(self) -> LockInStatus:
-        (
-            _,
-            _,
-            motor_lock_status,
-        ) = self._request(6021)
-        return LockInStatus(int(motor_lock_status))
+        (motor_lock_status,) = self._request_fields(6021)
+        return LockInStatus(motor_lock_status)
 
     def start_controller(self, controller_mode: ControllerMode):
         self._request(6001, (controller_mode.value,))
@@ -852,8 +1244,7 @@ class PyGeoCom:
         self._request(9051, (l_direction.value, bool.value))
 
     def get_server_software_version(self) -> Tuple[int, int, int]:
-        _, _, release, version, subversion = self._request(110)
-        return int(release), int(version), int(subversion)
+        return self._request_fields(110)
 
     def set_send_delay(self, delay_ms: int):
         self._request(109, (delay_ms,))
@@ -1016,20 +1407,17 @@ class PyGeoCom:
     def set_search_spiral(self, horizontal_range: float, vertical_range: float):
         self._request(9041, (horizontal_range, vertical_range))
 
-    def get_signal(self):
-        _, _, signal_intensity, time = self._request(2022)
-        return float(signal_intensity), int(time)
+    def get_signal(self) -> Tuple[float, int]:
+        return self._request_fields(2022)
 
     def get_face(self) -> int:
-        _, _, face = self._request(2026)
-        return int(face)
+        (face,) = self._request_fields(2026)
+        return face
 
     def get_coordinate(
         self, inclination_mode: TMCInclinationMode, wait_time: int = 1000
     ) -> Tuple[Coordinate, int, Coordinate, int]:
         (
-            _,
-            _,
             e,
             n,
             h,
@@ -1038,66 +1426,50 @@ class PyGeoCom:
             n_cont,
             h_cont,
             measure_time_cont,
-        ) = self._request(
+        ) = self._request_fields(
             2082,
             (wait_time, inclination_mode.value),
             return_code_handler=noop_return_code_handler,
         )
-        coordinate = Coordinate(float(e), float(n), float(h))
-        coordinate_cont = Coordinate(float(e_cont), float(n_cont), float(h_cont))
-        measure_time = int(measure_time)
-        measure_time_cont = int(measure_time_cont)
+        coordinate = Coordinate(e, n, h)
+        coordinate_cont = Coordinate(e_cont, n_cont, h_cont)
         return coordinate, measure_time, coordinate_cont, measure_time_cont
 
     # UNDOCUMENTED MEASUREMENT MODE TMC_GetFullMeas 2167
     def get_full_measurement(
         self, inclination_mode: TMCInclinationMode, wait_time: int = 1000
-    ) -> Tuple[Coordinate, int, Coordinate, int]:
-        (
-            _,
-            _,
-            horizontal,
-            vertical,
-            accIncl,
-            crossIncl,
-            lenIncl,
-            accIncl,
-            slope_distance,
-            measure_time,
-        ) = self._request(
+    ) -> Tuple[int, float, float, float, float, float, float]:
+        """
+        :returns: measure time, hz, v, slope distance, acc. inclination,
+            cross inclination, length inclination
+        """
+        return self.submit_full_measurement(inclination_mode, wait_time).result()
+
+    def submit_full_measurement(
+        self, inclination_mode: TMCInclinationMode, wait_time: int = 1000
+    ) -> PendingReply:
+        """Pipelined variant of ``get_full_measurement``, see ``submit``."""
+        return self.submit(
             2167,
             (wait_time, inclination_mode.value),
             return_code_handler=noop_return_code_handler,
-        )
-        slope_distance = float(slope_distance)
-        measure_time = int(measure_time)
-        return (
-            measure_time,
-            float(horizontal),
-            float(vertical),
-            slope_distance,
-            float(accIncl),
-            float(crossIncl),
-            float(lenIncl),
+            decoder=REPLY_DECODERS[2167],
         )
 
     def get_simple_measurement(
         self, inclination_mode: TMCInclinationMode, wait_time: int = 1000
     ) -> Tuple[Angles, float]:
-        _, _, horizontal, vertical, slope_distance = self._request(
+        horizontal, vertical, slope_distance = self._request_fields(
             2108,
             (
                 wait_time,
                 inclination_mode.value,
             ),
         )
-        angles = Angles(float(horizontal), float(vertical))
-        slope_distance = float(slope_distance)
-        return angles, slope_distance
+        return Angles(horizontal, vertical), slope_distance
 
     def get_angles_simple(self, inclination_mode: TMCInclinationMode) -> Angles:
-        _, _, horizontal, vertical = self._request(2107, (inclination_mode.value,))
-        return Angles(float(horizontal), float(vertical))
+        return Angles(*self._request_fields(2107, (inclination_mode.value,)))
 
     def get_angles_complete(
         self, inclination_mode: TMCInclinationMode
@@ -1156,3 +1528,127 @@ class PyGeoCom:
 
     def beep_off(self):
         self._request(20000)
+
+
+class BatchStep:
+    def __init__(
+        self,
+        name: str,
+        rpc_id: int,
+        args: Tuple[Any, ...],
+        return_code_handler: Callable[[int], None],
+    ):
+        self.name = name
+        self.rpc_id = rpc_id
+        self.args = args
+        self.return_code_handler = return_code_handler
+        self.return_code: Optional[ReturnCode] = None
+        self.error: Optional[Exception] = None
+
+    def __repr__(self) -> str:
+        status = "ok" if self.error is None else repr(self.error)
+        return f"{self.name} ({self.rpc_id}): {status}"
+
+
+class GeoComBatchError(Exception):
+    def __init__(self, steps: List[BatchStep]):
+        self.steps = steps
+        self.failed = [step for step in steps if step.error is not None]
+        super().__init__(
+            f"{len(self.failed)} of {len(steps)} batched requests failed: {self.failed}"
+        )
+
+
+class CommandBatch:
+    """
+    Sequence of GeoCOM requests that is sent back-to-back.
+
+    Call ``PyGeoCom`` setters on the batch to record them, e.g.
+    ``geo.batch().set_prism_type(PrismType.LEICA_360).lock_in().execute()``.
+    ``execute`` writes up to ``max_in_flight`` requests (at most the
+    ``max_in_flight`` of the connection) before it waits for the first reply,
+    so on a pipelined connection the steps only pay one round trip together.
+    With ``max_in_flight=1`` on the connection they are sent one at a time.
+    Every step is sent even if an earlier one fails; failures are collected
+    per step and raised as one ``GeoComBatchError``. Getters cannot be
+    batched since their values are unpacked right away.
+    """
+
+    def __init__(self, geocom: PyGeoCom, max_in_flight: int = MAX_TRANSACTION_ID + 1):
+        if max_in_flight < 1 or max_in_flight > MAX_TRANSACTION_ID + 1:
+            raise ValueError(
+                f"max_in_flight must be between 1 and {MAX_TRANSACTION_ID + 1}"
+            )
+        self._geocom = geocom
+        self._max_in_flight = max_in_flight
+        self._step_name = ""
+        self.steps: List[BatchStep] = []
+
+    def __getattr__(self, name: str) -> Callable[..., "CommandBatch"]:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        method = getattr(PyGeoCom, name)
+
+        def record(*args, **kwargs) -> "CommandBatch":
+            n_steps = len(self.steps)
+            self._step_name = name
+            try:
+                method(self, *args, **kwargs)
+            except TypeError as e:
+                del self.steps[n_steps:]
+                raise TypeError(f"{name} cannot be batched: {e}") from e
+            return self
+
+        return record
+
+    def _request(
+        self,
+        rpc_id: int,
+        args: Tuple[Any, ...] = (),
+        return_code_handler: Callable[[int], None] = default_return_code_handler,
+    ):
+        self.steps.append(BatchStep(self._step_name, rpc_id, args, return_code_handler))
+
+    def _request_fields(self, *args, **kwargs):
+        raise TypeError("getters return values")
+
+    def execute(self, raise_on_error: bool = True) -> List[BatchStep]:
+        geocom = self._geocom
+        # never deeper than the connection allows, one at a time without transaction ids
+        depth = min(self._max_in_flight, geocom.max_in_flight)
+        with geocom._lock:
+            pending: List[Tuple[BatchStep, PendingReply]] = []
+            try:
+                for step in self.steps:
+                    waiting = [
+                        (s, reply) for s, reply in pending if s.error is None and not reply.done()
+                    ]
+                    if len(waiting) >= depth:
+                        first, reply = waiting[0]
+                        try:
+                            geocom._wait_for(reply)
+                        except Exception as e:
+                            first.error = e
+                    try:
+                        pending.append(
+                            (step, geocom.submit(step.rpc_id, step.args, noop_return_code_handler))
+                        )
+                    except Exception as e:
+                        step.error = e
+                for step, reply in pending:
+                    if step.error is not None:
+                        continue
+                    try:
+                        step.return_code = reply.result()[1]
+                        step.return_code_handler(step.return_code)
+                    except Exception as e:
+                        step.error = e
+            finally:
+                # replies that never came must not be matched to later requests
+                for _, reply in pending:
+                    if not reply.done():
+                        geocom._pending.pop(reply.transaction_id, None)
+
+        if raise_on_error and any(step.error is not None for step in self.steps):
+            raise GeoComBatchError(self.steps)
+        return self.steps
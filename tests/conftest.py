@@ -0,0 +1,7 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def in_tmp_path(tmp_path, monkeypatch):
+    # the database code creates ./db next to the scripts
+    monkeypatch.chdir(tmp_path)
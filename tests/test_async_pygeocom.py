@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from src.AsyncPyGeoCom import AsyncPyGeoCom, AsyncSerialStream
+from src.GeoComSimulator import SimulatedInstrument, SimulatorConfig, SimulatorStream
+
+
+def make_stream(timeout: float = 0.05, drop: tuple = ()) -> SimulatorStream:
+    config = SimulatorConfig(latency=0.002, latency_jitter=0.0, baud=None, seed=1)
+    instrument = SimulatedInstrument(config)
+    handle = instrument.handle
+
+    # never answer the RPCs in ``drop``
+    def handle_or_drop(request: bytes):
+        header = request.strip().partition(b":")[0].split(b",")
+        if len(header) > 1 and int(header[1]) in drop:
+            return None
+        return handle(request)
+
+    instrument.handle = handle_or_drop
+    return SimulatorStream(instrument, timeout=timeout)
+
+
+def run(test, stream: SimulatorStream, **kwargs):
+    async def main():
+        geo = await AsyncPyGeoCom.open(AsyncSerialStream(stream), **kwargs)
+        try:
+            return await test(geo)
+        finally:
+            await geo.close()
+
+    return asyncio.run(main())
+
+
+def test_concurrent_requests_are_matched_by_id():
+    async def test(geo):
+        return await asyncio.gather(
+            *[
+                request()
+                for _ in range(5)
+                for request in (geo.get_server_software_version, geo.get_software_version, geo.get_internal_temperature)
+            ]
+        )
+
+    replies = run(test, make_stream(), max_in_flight=4)
+    assert replies == [(1, 0, 0), (3, 0, 5), 21.5] * 5
+
+
+def test_dropped_reply_raises_timeout():
+    async def test(geo):
+        lost, version = await asyncio.gather(
+            geo.get_instrument_name(), geo.get_software_version(), return_exceptions=True
+        )
+        assert isinstance(lost, TimeoutError)
+        assert version == (3, 0, 5)
+        # the late requests are not answered with the lost one's reply
+        assert await geo.get_software_version() == (3, 0, 5)
+        assert geo.statistics[5004].timeouts == 1
+        assert not geo._pending
+
+    run(test, make_stream(drop=(5004,)), timeout=0.1)
+
+
+def test_pending_requests_fail_when_the_reader_dies():
+    stream = make_stream(drop=(5004,))
+    readline = stream.readline
+    broken = False
+
+    def readline_or_fail():
+        if broken:
+            raise OSError("port unplugged")
+        return readline()
+
+    stream.readline = readline_or_fail
+
+    async def test(geo):
+        nonlocal broken
+        pending = asyncio.ensure_future(geo.get_instrument_name())
+        await asyncio.sleep(0.01)
+        broken = True
+        with pytest.raises(OSError, match="port unplugged"):
+            await pending
+        # no reader anymore, later requests fail right away
+        with pytest.raises(ConnectionError):
+            await geo.get_software_version()
+
+    run(test, stream, timeout=5.0)
@@ -0,0 +1,134 @@
+import numpy as np
+import pytest
+
+from src.CircleContest import circle_fit
+from src.CircleFit import (
+    StreamingCircleFit,
+    circle_fit_batch,
+    circle_fit_padded,
+    geometric_circle_fit,
+    geometric_circle_fit_batch,
+    robust_circle_fit,
+)
+
+
+def arc(rng, n: int, x_c: float = 1000.0, y_c: float = 2000.0, r: float = 2.0, span: float = 2 * np.pi, noise: float = 0.005):
+    phi = rng.uniform(0, span, n)
+    x = x_c + r * np.cos(phi) + rng.normal(0, noise, n)
+    y = y_c + r * np.sin(phi) + rng.normal(0, noise, n)
+    return x, y
+
+
+def reference(x, y):
+    # circle_fit relative to the first point, it loses digits far from the origin
+    x_c, y_c, r = circle_fit(x - x[0], y - y[0])
+    return x_c + x[0], y_c + y[0], r
+
+
+def sigma(x, y, x_c, y_c, r) -> float:
+    # as in process_run
+    v = np.hypot(x - x_c, y - y_c) - r
+    return np.sqrt(v @ v / (len(x) - 3))
+
+
+def test_streaming_fit_matches_circle_fit():
+    rng = np.random.default_rng(1)
+    x, y = arc(rng, 200, span=np.pi)
+    fit = StreamingCircleFit()
+    for xi, yi in zip(x[:2], y[:2]):
+        fit.add(xi, yi)
+    assert fit.solve() is None
+    for xi, yi in zip(x[2:], y[2:]):
+        fit.add(xi, yi)
+    np.testing.assert_allclose(fit.solve(), reference(x, y), rtol=0, atol=1e-8)
+    assert fit.sigma == pytest.approx(sigma(x, y, *reference(x, y)), rel=0.05)
+
+    # sliding window
+    for xi, yi in zip(x[:150], y[:150]):
+        fit.remove(xi, yi)
+    assert fit.n == 50
+    np.testing.assert_allclose(fit.solve(), reference(x[150:], y[150:]), rtol=0, atol=1e-6)
+
+    fit.clear()
+    assert fit.solve() is None and fit.sigma is None
+
+
+def trajectories(rng):
+    sizes = [50, 2, 120, 4, 80]
+    xs, ys = zip(*[arc(rng, n, x_c=10.0 * i, r=1.0 + i, span=np.pi + i) for i, n in enumerate(sizes)])
+    # collinear points have no circle
+    xs += (np.linspace(0.0, 1.0, 10),)
+    ys += (np.linspace(0.0, 1.0, 10),)
+    return list(xs), list(ys)
+
+
+def test_batch_fit_matches_circle_fit():
+    xs, ys = trajectories(np.random.default_rng(2))
+    offsets = np.r_[0, np.cumsum([len(x) for x in xs])]
+    x_c, y_c, r, s = circle_fit_batch(np.concatenate(xs), np.concatenate(ys), offsets)
+    for i, (x, y) in enumerate(zip(xs, ys)):
+        if len(x) < 3 or i == len(xs) - 1:
+            assert np.isnan([x_c[i], y_c[i], r[i], s[i]]).all()
+            continue
+        expected = reference(x, y)
+        np.testing.assert_allclose([x_c[i], y_c[i], r[i]], expected, rtol=0, atol=1e-8)
+        if len(x) > 3:
+            assert s[i] == pytest.approx(sigma(x, y, *expected), rel=1e-6)
+        else:
+            assert np.isnan(s[i])
+
+
+def test_padded_fit_matches_batch_fit():
+    xs, ys = trajectories(np.random.default_rng(3))
+    k = max(len(x) for x in xs)
+    mask = np.arange(k) < np.array([len(x) for x in xs])[:, None]
+    x_padded = np.zeros(mask.shape)
+    y_padded = np.zeros(mask.shape)
+    x_padded[mask] = np.concatenate(xs)
+    y_padded[mask] = np.concatenate(ys)
+    offsets = np.r_[0, np.cumsum([len(x) for x in xs])]
+    np.testing.assert_array_equal(
+        circle_fit_padded(x_padded, y_padded, mask),
+        circle_fit_batch(np.concatenate(xs), np.concatenate(ys), offsets),
+    )
+
+
+def test_geometric_fit_minimizes_the_distances():
+    rng = np.random.default_rng(4)
+    # exact points: both fits find the circle
+    x, y = arc(rng, 30, noise=0.0)
+    np.testing.assert_allclose(geometric_circle_fit(x, y), (1000.0, 2000.0, 2.0), rtol=0, atol=1e-9)
+
+    # short noisy arc: the algebraic fit is biased, the geometric one has the smaller residuals
+    x, y = arc(rng, 100, span=np.pi / 3, noise=0.02)
+    algebraic = reference(x, y)
+    geometric = geometric_circle_fit(x, y)
+    assert sigma(x, y, *geometric) < sigma(x, y, *algebraic)
+    np.testing.assert_allclose(geometric, algebraic, rtol=0, atol=0.5)
+    # no small step improves it
+    for delta in np.eye(3) * 1e-4:
+        assert sigma(x, y, *geometric) <= sigma(x, y, *(np.array(geometric) + delta))
+        assert sigma(x, y, *geometric) <= sigma(x, y, *(np.array(geometric) - delta))
+
+    x_c, y_c, r, s = geometric_circle_fit_batch(x, y, [0, len(x)])
+    assert (x_c[0], y_c[0], r[0]) == geometric
+    assert s[0] == pytest.approx(sigma(x, y, *geometric))
+
+
+def test_robust_fit_rejects_blunders():
+    rng = np.random.default_rng(5)
+    x, y = arc(rng, 300)
+    np.testing.assert_allclose(robust_circle_fit(x, y)[:3], reference(x, y), rtol=0, atol=1e-3)
+
+    blunders = rng.choice(len(x), 15, replace=False)
+    # pushed away from the centre
+    scale = np.ones(len(x))
+    scale[blunders] += rng.uniform(0.15, 0.5, len(blunders))
+    x_bad = 1000.0 + (x - 1000.0) * scale
+    y_bad = 2000.0 + (y - 2000.0) * scale
+    x_c, y_c, r, inliers = robust_circle_fit(x_bad, y_bad)
+    assert not inliers[blunders].any()
+    assert inliers.sum() >= len(x) - len(blunders) - 3
+    np.testing.assert_allclose((x_c, y_c, r), reference(x, y), rtol=0, atol=2e-3)
+    # the plain fit is pulled away by the blunders
+    assert abs(reference(x_bad, y_bad)[2] - 2.0) > 0.01
@@ -0,0 +1,170 @@
+import os
+import threading
+
+import numpy as np
+
+import src.Database as database
+from src.Database import Database, EvaluationMetric
+from src.Run import Run
+from src.RunLog import RunLog, SyncPolicy
+from src.Snapshot import fingerprint, read_snapshot, write_snapshot
+
+
+def make_run(i: int, session: str = "S") -> Run:
+    return Run(
+        session=session,
+        name=f"n{i}",
+        circ_radius=1.0 + i / 10,
+        circ_std=0.01 * (i % 7 + 1),
+        n_outliers=i % 3,
+    )
+
+
+def assert_same_runs(db: Database, runs) -> None:
+    assert db.ids == [run.id for run in runs]
+    assert db.sessions == [run.session for run in runs]
+    assert db.names == [run.name for run in runs]
+    np.testing.assert_array_equal(db.radii, [run.circ_radius for run in runs])
+    np.testing.assert_array_equal(db.stds, [run.circ_std for run in runs])
+    np.testing.assert_array_equal(db.table.n_outliers, [run.n_outliers for run in runs])
+
+
+def write_csv(filename, runs) -> None:
+    with open(filename, "w") as f:
+        f.writelines(f"{run}\n" for run in runs)
+
+
+def test_snapshot_is_stale_if_csv_is_rewritten_before_it_is_written(tmp_path, monkeypatch):
+    csv = tmp_path / "db.csv"
+    write_csv(csv, [make_run(i) for i in range(10)])
+    rewritten = [make_run(i, session="T") for i in range(12)]
+
+    # another process rewrites db.csv after the lock was released, before the snapshot is written
+    replay = Database._replay
+
+    def replay_then_rewrite(self, tail):
+        changed = replay(self, tail)
+        write_csv(csv, rewritten)
+        return changed
+
+    monkeypatch.setattr(Database, "_replay", replay_then_rewrite)
+    Database.from_file(filename=str(csv))
+    monkeypatch.undo()
+
+    db = Database.from_file(filename=str(csv))
+    assert db.ids == [run.id for run in rewritten]
+    assert set(db.sessions) == {"T"}
+    np.testing.assert_array_equal(db.radii, [run.circ_radius for run in rewritten])
+
+
+def test_snapshot_plus_tail_matches_the_csv(tmp_path, monkeypatch):
+    csv = tmp_path / "db.csv"
+    runs = [make_run(i, session="ST"[i % 2]) for i in range(10)]
+    write_csv(csv, runs)
+    assert_same_runs(Database.from_file(filename=str(csv)), runs)
+    assert csv.with_suffix(".snapshot").exists()
+
+    # another process appends runs and deletes one
+    log = RunLog(str(csv), policy=SyncPolicy.ALWAYS, compact_after=1000)
+    later = [make_run(i, session="U") for i in range(10, 14)]
+    for run in later:
+        log.append(str(run))
+    log.delete(runs[3].id)
+    log.close()
+    expected = [run for run in runs + later if run is not runs[3]]
+
+    offsets = []
+    read_log = database.read_log
+
+    def spy(filename, offset=0):
+        offsets.append(offset)
+        return read_log(filename, offset)
+
+    monkeypatch.setattr(database, "read_log", spy)
+    db = Database.from_file(filename=str(csv), snapshot_after=1)
+    # only the tail after the snapshot was parsed
+    assert offsets[0] > 0
+    assert_same_runs(db, expected)
+    assert db.log.tombstones == 1
+
+    # read from the new snapshot alone, the same as from the csv alone
+    offsets.clear()
+    assert_same_runs(Database.from_file(filename=str(csv)), expected)
+    assert offsets == [os.path.getsize(csv)]
+    csv.with_suffix(".snapshot").unlink()
+    assert_same_runs(Database.from_file(filename=str(csv)), expected)
+
+
+def test_refresh_reads_changes_of_another_instance(tmp_path):
+    csv = tmp_path / "db.csv"
+    runs = [make_run(i) for i in range(6)]
+    write_csv(csv, runs)
+    writer = Database.from_file(filename=str(csv))
+    reader = Database.from_file(filename=str(csv))
+    # rankings built before the refresh are kept up to date
+    assert reader.position(id=runs[5].id, ev_metric=EvaluationMetric.STD) == 6
+
+    best = Run(session="S", name="best", circ_radius=2.0, circ_std=0.001, coords=np.ones((5, 2)))
+    writer.insert_run(best)
+    writer.del_run(runs[0].id)
+    assert reader.refresh() == 2
+    assert reader.refresh() == 0
+    assert_same_runs(reader, runs[1:] + [best])
+    assert reader.position(id=best.id, ev_metric=EvaluationMetric.STD) == 1
+    assert reader.position(id=runs[5].id, ev_metric=EvaluationMetric.STD) == 6
+    # the trajectory stored by the other instance
+    np.testing.assert_array_equal(reader.get_run(best.id).coords, best.coords)
+
+    # compacted by another process: read again in full, the writer appends to the new file
+    tmp = csv.with_suffix(".tmp")
+    write_csv(tmp, runs[1:] + [best])
+    os.replace(tmp, csv)
+    later = make_run(7)
+    writer.insert_run(later)
+    reader.refresh()
+    assert_same_runs(reader, runs[1:] + [best, later])
+    assert reader.position(id=later.id, ev_metric=EvaluationMetric.STD) == 2
+    writer.log.close()
+    reader.log.close()
+
+
+def test_quotes_in_names_are_kept(tmp_path):
+    csv = tmp_path / "db.csv"
+    runs = [make_run(i) for i in range(4)]
+    runs[1].name = '"Ace" Carl'
+    runs[2].name = 'Bob "the builder'
+    write_csv(csv, runs)
+    assert_same_runs(Database.from_file(filename=str(csv)), runs)
+
+    later = make_run(4)
+    later.name = 'Dan"'
+    with open(csv, "a") as f:
+        f.write(f"{later}\n")
+    # from the snapshot plus the tail
+    assert_same_runs(Database.from_file(filename=str(csv)), runs + [later])
+
+
+def test_concurrent_snapshot_writes_do_not_collide(tmp_path):
+    csv = tmp_path / "db.csv"
+    runs = [make_run(i) for i in range(200)]
+    write_csv(csv, runs)
+    table = Database.from_file(filename=str(csv)).table
+    snapshot = csv.with_suffix(".snapshot")
+    size = os.path.getsize(csv)
+    errors = []
+
+    def write():
+        try:
+            for _ in range(20):
+                write_snapshot(snapshot, table, size, 0, fingerprint(csv, size))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert list(tmp_path.glob("*.tmp")) == []
+    assert read_snapshot(snapshot, csv)[0].ids == [run.id for run in runs]
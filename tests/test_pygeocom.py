@@ -0,0 +1,144 @@
+import pytest
+
+from src.GeoComSimulator import SimulatedInstrument, SimulatorConfig, SimulatorStream
+from src.pygeocom import (
+    REPLY_DECODERS,
+    GeoComBatchError,
+    OnOff,
+    PrismType,
+    PyGeoCom,
+    ReturnCode,
+    compile_decoder,
+    decode_parameters,
+    noop_return_code_handler,
+    parse_reply_header,
+)
+
+
+def make_stream(timeout: float = 0.2, drop: tuple = ()) -> SimulatorStream:
+    config = SimulatorConfig(latency=0.002, latency_jitter=0.0, baud=None, seed=1)
+    instrument = SimulatedInstrument(config)
+    handle = instrument.handle
+
+    # never answer the RPCs in ``drop``
+    def handle_or_drop(request: bytes):
+        header = request.strip().partition(b":")[0].split(b",")
+        if len(header) > 1 and int(header[1]) in drop:
+            return None
+        return handle(request)
+
+    instrument.handle = handle_or_drop
+    return SimulatorStream(instrument, timeout=timeout)
+
+
+@pytest.mark.parametrize("max_in_flight", [1, 4, 8])
+def test_replies_are_matched_to_their_requests(max_in_flight):
+    geo = PyGeoCom(make_stream(), max_in_flight=max_in_flight)
+    rpcs = [5003, 5034, 5011, 110] * 5
+    pending = []
+    for rpc_id in rpcs:
+        pending.append(geo.submit(rpc_id, decoder=REPLY_DECODERS[rpc_id]))
+        assert geo.in_flight <= max_in_flight
+    expected = {5003: (999999,), 5034: (3, 0, 5), 5011: (21.5,), 110: (1, 0, 0)}
+    assert [reply.result() for reply in pending] == [expected[rpc_id] for rpc_id in rpcs]
+    assert geo.in_flight == 0
+
+
+def test_unanswered_request_gives_way_to_later_ones():
+    geo = PyGeoCom(make_stream(timeout=0.05, drop=(5004,)), max_in_flight=2)
+    first_lost = geo.submit(5004)
+    second_lost = geo.submit(5004)
+    # no reply frees a slot, the oldest request is given up
+    reply = geo.submit(5003)
+    assert first_lost.done() and not second_lost.done()
+    with pytest.raises(TimeoutError):
+        first_lost.result()
+    assert reply.result()[1] == ReturnCode.GRC_OK
+    with pytest.raises(TimeoutError):
+        second_lost.result()
+    assert geo.statistics[5004].timeouts == 2
+    assert geo.statistics[5003].calls == 1
+    assert geo.in_flight == 0
+
+
+def test_synchronous_timeout_is_recorded():
+    geo = PyGeoCom(make_stream(timeout=0.05, drop=(5004,)))
+    with pytest.raises(TimeoutError):
+        geo.get_instrument_name()
+    assert geo.in_flight == 0
+    assert geo.get_instrument_number() == 999999
+    assert geo.statistics[5004].timeouts == 1
+
+
+def test_statistics_count_calls_bytes_and_errors():
+    geo = PyGeoCom(make_stream(), max_in_flight=4)
+    for _ in range(10):
+        geo.get_instrument_number()
+    with pytest.raises(Exception):
+        geo.lock_in()
+
+    stats = geo.statistics[5003]
+    assert stats.calls == 10
+    assert stats.bytes_out == 10 * len(b"\n%R1Q,5003,1:\r\n")
+    assert stats.bytes_in > 0
+    assert len(stats.latencies) == 10
+    assert min(stats.latencies) >= 0.002
+    assert stats.percentile(50) <= stats.percentile(100)
+    summary = geo.statistics.summary()
+    assert summary[5003]["calls"] == 10
+    assert summary[9013]["return_codes"] == {ReturnCode.AUT_RC_NOT_ENABLED.name: 1}
+
+
+@pytest.mark.parametrize("max_in_flight", [1, 8])
+def test_batch_sends_all_steps(max_in_flight):
+    stream = make_stream()
+    geo = PyGeoCom(stream, max_in_flight=max_in_flight)
+    geo.batch().set_prism_type(PrismType.LEICA_MINI).set_user_atr_state(OnOff.ON).set_user_lock_state(
+        OnOff.ON
+    ).lock_in().execute()
+    instrument = stream.instrument
+    assert instrument.prism_type == PrismType.LEICA_MINI.value
+    assert (instrument.atr, instrument.lock_state, instrument.locked) == (1, 1, True)
+    assert geo.in_flight == 0
+
+
+def test_batch_collects_failed_steps():
+    stream = make_stream(timeout=0.05, drop=(18005,))
+    geo = PyGeoCom(stream, max_in_flight=2)
+    batch = geo.batch().lock_in().set_user_atr_state(OnOff.ON).set_prism_type(PrismType.LEICA_MINI)
+    with pytest.raises(GeoComBatchError) as error:
+        batch.execute()
+    lock_in, atr, prism = error.value.steps
+    assert lock_in.return_code == ReturnCode.AUT_RC_NOT_ENABLED
+    assert isinstance(atr.error, TimeoutError)
+    assert prism.error is None and prism.return_code == ReturnCode.GRC_OK
+    assert stream.instrument.prism_type == PrismType.LEICA_MINI.value
+    assert geo.in_flight == 0
+    assert geo.get_instrument_number() == 999999
+
+
+def test_decoder_matches_untyped_reply():
+    stream = make_stream()
+    stream.instrument.tracking = True
+    stream.write(b"\n%R1Q,2167:300,1\r\n")
+    geocom_return_code, _, parameters = parse_reply_header(stream.readline())
+    decoded = decode_parameters(geocom_return_code, parameters, noop_return_code_handler, REPLY_DECODERS[2167])
+    _, _, hz, v, angle_accuracy, cross, length, inclination_accuracy, distance, time = decode_parameters(
+        geocom_return_code, parameters, noop_return_code_handler
+    )
+    assert decoded == (
+        int(time),
+        float(hz),
+        float(v),
+        float(distance),
+        float(inclination_accuracy),
+        float(cross),
+        float(length),
+    )
+
+
+def test_decoder_rejects_short_replies():
+    decode = compile_decoder((1, float), (3, int))
+    assert decode([b"0", b"1.5", b"x", b"7\r\n"]) == (1.5, 7)
+    with pytest.raises(ValueError, match="Expected 4 reply parameters"):
+        decode([b"0", b"1.5"])
@@ -0,0 +1,59 @@
+import numpy as np
+
+from src.RankIndex import RankIndex
+
+
+def expected_order(entries: dict) -> list:
+    # entries: id -> (value, insertion order), ranked by a stable argsort of the values
+    ids = sorted(entries, key=lambda id: entries[id][1])
+    values = np.array([entries[id][0] for id in ids])
+    return [ids[i] for i in np.argsort(values, kind="stable")]
+
+
+def check(index: RankIndex, entries: dict) -> None:
+    order = expected_order(entries)
+    assert len(index) == len(order)
+    assert index.top(len(order) + 5) == order
+    assert index.top(7) == order[:7]
+    for position, id in enumerate(order, start=1):
+        assert index.position(id) == position
+
+
+def test_positions_match_stable_argsort():
+    rng = np.random.default_rng(5)
+    # few distinct values, so ties are common
+    values = rng.integers(0, 20, 300).astype(float)
+    ids = [f"r{i}" for i in range(len(values))]
+    index = RankIndex.build(ids, values.tolist(), load=8)
+    entries = {id: (value, i) for i, (id, value) in enumerate(zip(ids, values.tolist()))}
+    check(index, entries)
+
+    seq = len(ids)
+    for step in range(600):
+        id = f"r{rng.integers(0, 400)}"
+        if rng.random() < 0.3:
+            index.remove(id)
+            entries.pop(id, None)
+        else:
+            value = float(rng.integers(0, 20))
+            index.insert(id, value)
+            entries[id] = (value, seq)
+            seq += 1
+        if step % 50 == 0:
+            check(index, entries)
+    check(index, entries)
+
+
+def test_empty_and_unknown_ids():
+    index = RankIndex(load=2)
+    assert index.top(3) == []
+    index.insert("a", 1.0)
+    index.remove("a")
+    index.remove("unknown")
+    assert len(index) == 0
+    try:
+        index.position("a")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("position of a removed id")
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from src.Database import Database
+from src.Rescore import rescore, rescore_sqlite
+from src.Run import Run
+from src.SqliteDatabase import SqliteDatabase
+
+
+def noisy_circle(rng: np.random.Generator, n: int = 500) -> np.ndarray:
+    phi = np.linspace(0, 5, n)
+    x = 2 * np.cos(phi) + rng.normal(0, 0.02, n)
+    y = 2 * np.sin(phi) + rng.normal(0, 0.02, n)
+    # blunders
+    x[::50] += 1.0
+    return np.c_[x, y]
+
+
+def make_runs(n: int) -> list:
+    rng = np.random.default_rng(0)
+    return [
+        Run(session=f"S{i % 3}", name=f"n{i}", circ_radius=1.0, circ_std=1.0, coords=noisy_circle(rng))
+        for i in range(n)
+    ]
+
+
+def write_runs(filename: str, n: int = 20) -> None:
+    db = Database.from_file(filename=filename)
+    for run in make_runs(n):
+        db.insert_run(run)
+    db.log.close()
+
+
+def scores(filename: str) -> list:
+    db = Database.from_file(filename=filename)
+    runs = {run.id: (run.circ_radius, run.circ_std, run.n_outliers) for run in db.runs}
+    db.log.close()
+    return runs
+
+
+def test_rescore_is_idempotent(tmp_path):
+    filename = str(tmp_path / "db.csv")
+    write_runs(filename)
+
+    report = rescore(filename, outlier_threshold=4.0, workers=2, chunk_size=4)
+    assert report.runs == 20 and report.skipped == 0
+    first = scores(filename)
+    assert all(n_outliers > 0 for _, _, n_outliers in first.values())
+    assert all(abs(r - 2) < 0.01 for r, _, _ in first.values())
+
+    rescore(filename, outlier_threshold=4.0, workers=2, chunk_size=4)
+    assert scores(filename) == first
+    assert (tmp_path / "db.bak").exists()
+
+
+def test_rescore_without_outlier_rejection_keeps_all_points(tmp_path):
+    filename = str(tmp_path / "db.csv")
+    write_runs(filename, n=4)
+
+    rescore(filename, outlier_threshold=4.0, workers=1)
+    rescore(filename, outlier_threshold=None, workers=1)
+    assert all(n_outliers == 0 for _, _, n_outliers in scores(filename).values())
+
+
+def test_rescore_sqlite_updates_the_stored_scores(tmp_path):
+    csv = str(tmp_path / "csv" / "db.csv")
+    (tmp_path / "csv").mkdir()
+    sqlite = str(tmp_path / "sqlite" / "db.sqlite")
+    db = SqliteDatabase.from_file(filename=sqlite, csv=None)
+    csv_db = Database.from_file(filename=csv)
+    runs = make_runs(6)
+    for run in runs:
+        db.insert_run(run)
+        csv_db.insert_run(run)
+    csv_db.log.close()
+    # without trajectory, keeps its score
+    kept = Run(session="S0", name="kept", circ_radius=1.5, circ_std=0.5)
+    db.insert_run(kept)
+    db.connection.close()
+
+    report = rescore_sqlite(sqlite, outlier_threshold=4.0, workers=2, chunk_size=2)
+    assert report.runs == 6 and report.skipped == 1
+    rescore(csv, outlier_threshold=4.0, workers=2, chunk_size=2)
+
+    db = SqliteDatabase.from_file(filename=sqlite, csv=None)
+    expected = scores(csv)
+    for run in runs:
+        stored = db.get_run(run.id)
+        radius, std, n_outliers = expected[run.id]
+        assert stored.circ_radius == pytest.approx(radius, rel=1e-12)
+        assert stored.circ_std == pytest.approx(std, rel=1e-12)
+        assert stored.n_outliers == n_outliers > 0
+    stored = db.get_run(kept.id)
+    assert (stored.circ_radius, stored.circ_std, stored.n_outliers) == (1.5, 0.5, 0)
+    ratios = dict(zip(db.ids, db.ratios))
+    assert ratios[runs[0].id] == pytest.approx(expected[runs[0].id][1] / expected[runs[0].id][0])
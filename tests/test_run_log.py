@@ -0,0 +1,86 @@
+import threading
+import time
+
+from src.Database import is_tombstone, read_columns, read_log
+from src.Run import Run
+from src.RunLog import RunLog, SyncPolicy
+
+
+def make_run(i: int) -> Run:
+    return Run(session="S", name=f"n{i}", circ_radius=2.0, circ_std=0.01 * (i + 1))
+
+
+def tombstones(filename) -> set:
+    log = read_log(filename)[0]
+    return set(log.loc[is_tombstone(log), "id"])
+
+
+def test_append_and_delete(tmp_path):
+    log = RunLog(tmp_path / "db.csv", policy=SyncPolicy.ALWAYS, compact_after=1000)
+    runs = [make_run(i) for i in range(5)]
+    for run in runs:
+        log.append(str(run))
+    log.delete(runs[1].id)
+    log.close()
+
+    assert tombstones(tmp_path / "db.csv") == {runs[1].id}
+    columns = read_columns(tmp_path / "db.csv")
+    assert columns["id"].tolist() == [run.id for i, run in enumerate(runs) if i != 1]
+    assert log.tombstones == 1
+
+
+def test_compaction_drops_deleted_runs(tmp_path):
+    log = RunLog(tmp_path / "db.csv", group_interval=0.01, compact_after=3)
+    runs = [make_run(i) for i in range(10)]
+    for run in runs:
+        log.append(str(run))
+    for run in runs[:3]:
+        log.delete(run.id)
+    deadline = time.monotonic() + 5
+    while log.tombstones and time.monotonic() < deadline:
+        time.sleep(0.01)
+    log.append(str(make_run(10)))
+    log.close()
+
+    lines = (tmp_path / "db.csv").read_text().splitlines()
+    assert log.tombstones == 0
+    assert [l.split(",")[1] for l in lines] == [run.id for run in runs[3:]] + [lines[-1].split(",")[1]]
+
+
+def test_appends_go_on_during_compaction(tmp_path, monkeypatch):
+    log = RunLog(tmp_path / "db.csv", group_interval=0.01, compact_after=2)
+    runs = [make_run(i) for i in range(4)]
+    for run in runs:
+        log.append(str(run))
+
+    rewriting = threading.Event()
+    release = threading.Event()
+    rewrite = RunLog._rewrite
+
+    def slow_rewrite(self, tmp, end):
+        rewriting.set()
+        release.wait(5)
+        return rewrite(self, tmp, end)
+
+    monkeypatch.setattr(RunLog, "_rewrite", slow_rewrite)
+    log.delete(runs[0].id)
+    log.delete(runs[1].id)
+    assert rewriting.wait(5)
+
+    # neither blocked by the rewrite nor lost by the swap
+    later = [make_run(i) for i in range(4, 8)]
+    t0 = time.monotonic()
+    for run in later:
+        log.append(str(run))
+    log.delete(runs[2].id)
+    assert time.monotonic() - t0 < 1
+    release.set()
+    deadline = time.monotonic() + 5
+    while (tmp_path / "db.compact").exists() or tombstones(tmp_path / "db.csv") != {runs[2].id}:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    log.close()
+
+    columns = read_columns(tmp_path / "db.csv")
+    assert columns["id"].tolist() == [runs[3].id] + [run.id for run in later]
+    assert log.tombstones == 1
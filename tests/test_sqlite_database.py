@@ -0,0 +1,73 @@
+import numpy as np
+
+from src.Database import Database, EvaluationMetric
+from src.Run import Run
+from src.SqliteDatabase import SqliteDatabase
+
+
+def make_runs(n: int = 30) -> list:
+    rng = np.random.default_rng(3)
+    return [
+        Run(
+            session=f"S{i % 3}",
+            name=f"n{i}",
+            circ_radius=float(rng.uniform(1, 3)),
+            # ties rank in insertion order
+            circ_std=float(rng.choice([0.01, 0.02, 0.03, 0.05])),
+        )
+        for i in range(n)
+    ]
+
+
+def open_both(tmp_path) -> tuple:
+    csv = Database.from_file(filename=str(tmp_path / "db.csv"))
+    sqlite = SqliteDatabase.from_file(filename=str(tmp_path / "db.sqlite"), csv=None)
+    for run in make_runs():
+        csv.insert_run(run)
+        sqlite.insert_run(run)
+    return csv, sqlite
+
+
+def test_sqlite_matches_csv_database(tmp_path, capsys):
+    csv, sqlite = open_both(tmp_path)
+    for ev_metric in EvaluationMetric:
+        assert sqlite.leaderboard(n_max=10, ev_metric=ev_metric) == csv.leaderboard(n_max=10, ev_metric=ev_metric)
+        np.testing.assert_array_equal(sqlite.metric_values(ev_metric), csv.metric_values(ev_metric))
+        for id in csv.ids:
+            assert sqlite.position(id=id, ev_metric=ev_metric) == csv.position(id=id, ev_metric=ev_metric)
+            session = csv.get_run(id).session
+            assert sqlite.session_position(session=session, id=id, ev_metric=ev_metric) == csv.session_position(
+                session=session, id=id, ev_metric=ev_metric
+            )
+
+    csv_session, sqlite_session = csv.get_session("S1"), sqlite.get_session("S1")
+    assert len(sqlite_session) == len(csv_session) == 10
+    assert sqlite_session.leaderboard(n_max=3, ev_metric=EvaluationMetric.STD) == csv_session.leaderboard(
+        n_max=3, ev_metric=EvaluationMetric.STD
+    )
+
+    csv.sort(EvaluationMetric.RATIO)
+    sqlite.sort(EvaluationMetric.RATIO)
+    assert sqlite.ids == csv.ids
+    capsys.readouterr()
+    csv.print_runs()
+    printed = capsys.readouterr().out
+    sqlite.print_runs()
+    assert capsys.readouterr().out == printed
+
+    id = csv.ids[0]
+    csv.del_run(id)
+    sqlite.del_run(id)
+    assert len(sqlite) == len(csv) == 29
+    assert str(sqlite.get_run(csv.ids[0])) == str(csv.get_run(csv.ids[0]))
+    csv.log.close()
+
+
+def test_sqlite_refresh_sees_other_connections(tmp_path):
+    filename = str(tmp_path / "db.sqlite")
+    reader = SqliteDatabase.from_file(filename=filename, csv=None)
+    writer = SqliteDatabase.from_file(filename=filename, csv=None)
+    assert reader.refresh() == 0
+    writer.insert_run(Run(session="S", name="n", circ_radius=2.0, circ_std=0.1, n_outliers=2))
+    assert reader.refresh() == 1
+    assert len(reader) == 1 and reader.runs[0].n_outliers == 2
@@ -0,0 +1,109 @@
+import time
+
+import pytest
+
+from src.GeoComSimulator import SimulatedInstrument, SimulatorConfig, SimulatorStream
+import src.TotalStation
+from src.TotalStation import Connection, PollingCalibration, PollingTuner, TotalStation
+
+
+@pytest.fixture
+def ts() -> TotalStation:
+    config = SimulatorConfig(latency=0.001, latency_jitter=0.0, baud=None, seed=1)
+    stream = SimulatorStream(SimulatedInstrument(config), timeout=0.2)
+    return TotalStation(Connection(com="simulator", baud=0, tout=1), stream=stream)
+
+
+def test_calibration_tries_send_delays_then_wait_times():
+    calibration = PollingCalibration(300, send_delays=(0, 5), wait_times=(50, 100), n=2, budget=60)
+    settings = []
+    while not calibration.finished:
+        settings.append((calibration.send_delay, calibration.wait_time))
+        # only the 5 ms send delay and the 100 ms wait time give distances
+        calibration.record(calibration.send_delay == 5 and calibration.wait_time in (300, 100))
+    assert settings == [(0, 300)] * 2 + [(5, 300)] * 2 + [(5, 50)] * 2 + [(5, 100)] * 2
+    assert (calibration.send_delay, calibration.wait_time) == (5, 100)
+
+
+def test_calibration_stops_after_its_budget():
+    calibration = PollingCalibration(300, n=10**9, budget=0.05)
+    t0 = time.perf_counter()
+    while not calibration.finished:
+        calibration.record(True)
+    assert time.perf_counter() - t0 < 1
+    assert calibration.wait_time == 300
+
+
+def test_start_tracking_does_not_calibrate(ts):
+    assert ts.start_tracking()
+    assert not ts.calibrated
+
+
+def test_first_acquisition_calibrates(ts):
+    assert ts.start_tracking()
+    samples = ts.start_acquisition()
+    deadline = time.monotonic() + 10
+    while not ts.calibrated and time.monotonic() < deadline:
+        time.sleep(0.05)
+    ts.stop_acquisition()
+    assert ts.calibrated
+    assert len(samples.read()) > 0
+
+
+def test_tuner_is_updated_once_per_sample(ts, monkeypatch):
+    ts.calibrated = True
+    updates = []
+    monkeypatch.setattr(ts.tuner, "update", lambda valid: updates.append(valid))
+
+    def fail():
+        raise RuntimeError("restart failed")
+
+    monkeypatch.setattr(ts, "restart_distance", fail)
+    # not tracking: every reply lacks a distance, the 11th triggers the failing restart
+    for _ in range(12):
+        ts.measure_observation()
+    assert updates == [False] * 12
+
+
+def test_tuner_waits_for_the_calibration(ts, monkeypatch):
+    updates = []
+    monkeypatch.setattr(ts.tuner, "update", lambda valid: updates.append(valid))
+    for _ in range(3):
+        ts.measure_observation()
+    assert updates == []
+
+
+def samples(tuner: PollingTuner, clock: list, n_valid: int, seconds: float) -> None:
+    # one window, ``seconds`` per sample
+    for i in range(tuner.window):
+        clock[0] += seconds
+        tuner.update(i < n_valid)
+
+
+def test_tuner_keeps_the_wait_time_with_the_better_rate(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(src.TotalStation, "perf_counter", lambda: clock[0])
+    tuner = PollingTuner(100, window=10)
+    assert (tuner.lower, tuner.upper) == (50, 200)
+
+    # rare misses do not shrink it
+    for _ in range(10):
+        samples(tuner, clock, 10, 0.05)
+    assert tuner.wait_time == 100
+
+    # frequent misses: 150 ms is tried, but gives fewer valid samples per second
+    samples(tuner, clock, 5, 0.1)
+    assert tuner.wait_time == 150
+    samples(tuner, clock, 5, 0.15)
+    assert tuner.wait_time == 100
+
+    # next the other direction, which is kept
+    samples(tuner, clock, 5, 0.1)
+    assert tuner.wait_time == 66
+    samples(tuner, clock, 9, 0.066)
+    assert tuner.wait_time == 66
+
+    # never beyond the band
+    for _ in range(20):
+        samples(tuner, clock, 0, 0.1)
+        assert tuner.lower <= tuner.wait_time <= tuner.upper
@@ -0,0 +1,50 @@
+import threading
+
+import numpy as np
+
+from src.TrajectoryStore import TrajectoryStore
+
+
+def coords(i: int) -> np.ndarray:
+    return np.full((i % 7 + 1, 2), float(i))
+
+
+def test_concurrent_appends_keep_the_index_consistent(tmp_path):
+    # one store per writer, like contest.py processes on one session
+    def write(writer: int):
+        store = TrajectoryStore(tmp_path)
+        for i in range(writer, 400, 4):
+            store.append("S", f"r{i}", coords(i))
+
+    threads = [threading.Thread(target=write, args=(writer,)) for writer in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    store = TrajectoryStore(tmp_path)
+    for i in range(400):
+        np.testing.assert_array_equal(store.get("S", f"r{i}"), coords(i))
+    assert (tmp_path / "S.bin").stat().st_size == sum(coords(i).nbytes for i in range(400))
+
+
+def test_runs_stored_by_another_store_are_found(tmp_path):
+    writer = TrajectoryStore(tmp_path)
+    reader = TrajectoryStore(tmp_path)
+    writer.append("S", "a", coords(1))
+    np.testing.assert_array_equal(reader.get("S", "a"), coords(1))
+    assert reader.get("S", "b") is None
+
+    # after the reader read the index and mapped the points
+    writer.append("S", "b", coords(2))
+    assert ("S", "b") in reader
+    np.testing.assert_array_equal(reader.get("S", "b"), coords(2))
+    np.testing.assert_array_equal(reader.get("S", "a"), coords(1))
+
+    # a line still being written is skipped until it is complete
+    with open(tmp_path / "S.idx", "a") as f:
+        f.write("c,0")
+    assert reader.get("S", "c") is None
+    with open(tmp_path / "S.idx", "a") as f:
+        f.write(",1\n")
+    np.testing.assert_array_equal(reader.get("S", "c"), coords(1)[:1])